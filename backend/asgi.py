@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+The short url redirect view (shorturl.views.redirectShortUrl) is async,
+serve it through this application (e.g. uvicorn backend.asgi:application)
+so it runs on the event loop instead of a worker thread.
 """
 
 import os
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Build the short code filter while the server starts, not on the first lookup
+from shorturl.filter import short_code_filter
+
+short_code_filter.start()
@@ -0,0 +1,44 @@
+from django.conf import settings
+
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+NOT_FOUND = {'error': 'Not found'}
+
+
+# Checks the body of a batch request:
+#
+#   {"operations": [
+#       {"op": "create", ...fields},
+#       {"op": "update", "id": 1, ...fields},
+#       {"op": "delete", "id": 2}
+#   ]}
+#
+# Returns (operations, results, error). results has one entry per operation,
+# the error of the operations that are already rejected and None for the rest.
+# An id can only appear once per batch.
+def parse_operations(data):
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return None, None, 'operations should be a non empty list'
+    if len(operations) > settings.BATCH_MAX_OPERATIONS:
+        return None, None, f'At most {settings.BATCH_MAX_OPERATIONS} operations per request'
+
+    results = [None] * len(operations)
+    ids = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in (CREATE, UPDATE, DELETE):
+            results[index] = {'error': 'op should be create, update or delete'}
+            continue
+        if operation['op'] == CREATE:
+            continue
+        id = operation.get('id')
+        if not isinstance(id, int) or isinstance(id, bool):
+            results[index] = {'error': 'id should be a number'}
+        elif id in ids:
+            results[index] = {'error': 'id appears more than once in the batch'}
+        else:
+            ids.add(id)
+    return operations, results, None
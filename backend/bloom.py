@@ -0,0 +1,54 @@
+import hashlib
+import math
+
+
+# Counting Bloom filter: like a plain Bloom filter, but every slot is a small
+# counter instead of a bit so items can also be removed.
+# `in` never gives false negatives, false positives happen at about `error_rate`
+# as long as no more than `capacity` items are added.
+class CountingBloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._counters = bytearray(self.size)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            # Counters saturate instead of wrapping, a saturated slot is never decremented
+            if self._counters[position] < 255:
+                self._counters[position] += 1
+        self.count += 1
+
+    def remove(self, item):
+        positions = self._positions(item)
+        if not all(self._counters[position] for position in positions):
+            return False
+        for position in positions:
+            if self._counters[position] < 255:
+                self._counters[position] -= 1
+        self.count -= 1
+        return True
+
+    def __contains__(self, item):
+        counters = self._counters
+        return all(counters[position] for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size_bytes(self):
+        return len(self._counters)
+
+    # Expected false positive rate for the current number of items
+    def false_positive_rate(self):
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
@@ -0,0 +1,62 @@
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+CONTENT_TYPES = {CSV: 'text/csv; charset=utf-8', NDJSON: 'application/x-ndjson'}
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+# csv.writer target that hands the formatted line back instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(names, items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for item in items:
+        yield writer.writerow([csv_cell(item[name]) for name in names])
+
+
+def ndjson_lines(items):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for item in items:
+        yield encoder.encode(item) + '\n'
+
+
+# Streams the rows of `queryset` as CSV or NDJSON, in the representation of the
+# ValuesSerializer. Rows are read with .iterator(), so memory doesn't grow with
+# the number of rows, and the query only runs once the response is being sent
+# (the CSV header goes out first).
+def export_response(values, queryset, fmt, filename):
+    if fmt not in CONTENT_TYPES:
+        return Response({'error': 'Format should be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = values.queryset(queryset).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    items = values.iterate(rows)
+    if fmt == CSV:
+        lines = csv_lines([name for name, source, field in values.fields], items)
+    else:
+        lines = ndjson_lines(items)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,143 @@
+import math
+import re
+import time
+
+from functools import wraps
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+SLIDING_WINDOW = 'sliding_window'
+TOKEN_BUCKET = 'token_bucket'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+# '10/m' -> (10, 60), '2/100s' -> (2, 100)
+def parse_rate(rate):
+    match = RATE_RE.match(rate)
+    if match is None:
+        raise ValueError(f'Invalid rate: {rate}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def incr(key, timeout, delta=1):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Expired or evicted between add and incr
+        cache.add(key, 0, timeout)
+        return cache.incr(key, delta)
+
+
+# Sliding window counter: a counter per fixed window, and the previous window's
+# count weighted by how much of it still overlaps the sliding window.
+# Counters only change through atomic incr/decr, so concurrent requests can't
+# both take the last slot.
+class SlidingWindowLimiter:
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+
+    def hit(self, key):
+        now = time.time()
+        index = int(now // self.window)
+        current = f'{key}:{index}'
+        count = incr(current, self.window * 2)
+        previous = cache.get(f'{key}:{index - 1}', 0)
+        overlap = 1 - (now % self.window) / self.window
+        if math.floor(previous * overlap) + count > self.limit:
+            # Rejected requests don't use up the limit
+            cache.decr(current)
+            return False
+        return True
+
+
+# Token bucket holding up to `capacity` tokens, refilled at `rate` tokens per second.
+# Stored as the time the bucket was created and the number of tokens used since,
+# the tokens available are capacity + elapsed * rate - used.
+class TokenBucketLimiter:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        # Once idle for this long a bucket is full again and can be forgotten
+        self.timeout = math.ceil(capacity / rate) + 1
+
+    def hit(self, key):
+        now = time.time()
+        start_key = f'{key}:start'
+        cache.add(start_key, now, self.timeout)
+        start = cache.get(start_key, now)
+        # The counter is tied to the start time, so a bucket that expired (or was
+        # evicted) and got recreated starts with a fresh counter
+        used_key = f'{key}:used:{start}'
+        used = incr(used_key, self.timeout)
+        allowance = self.capacity + int((now - start) * self.rate)
+        if used > allowance:
+            cache.decr(used_key)
+            return False
+        # Tokens earned while idle beyond a full bucket are dropped so a burst can't
+        # exceed capacity. Only one request per second does it, so racing requests
+        # don't drop them twice.
+        excess = allowance - used - (self.capacity - 1)
+        if excess > 0 and cache.add(f'{used_key}:refill', 1, 1):
+            cache.incr(used_key, excess)
+        cache.touch(start_key, self.timeout)
+        cache.touch(used_key, self.timeout)
+        return True
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR')
+
+
+def request_key(request, key):
+    if callable(key):
+        return key(request)
+    if key == 'ip':
+        return f'ip:{client_ip(request)}'
+    if key == 'user':
+        return f'user:{request.user.pk}'
+    if key == 'user_or_ip':
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{client_ip(request)}'
+    raise ValueError(f'Unknown rate limit key: {key}')
+
+
+# Rate limit decorator for DRF views, place it below @api_view/@permission_classes
+# so request.user is already authenticated. For APIView methods wrap it in
+# django.utils.decorators.method_decorator.
+#
+#   @api_view(['GET', 'POST'])
+#   @permission_classes([IsAuthenticated])
+#   @ratelimit('60/m', key='user')
+#   def tasks(request): ...
+#
+# key is 'ip', 'user', 'user_or_ip' or a callable taking the request.
+# Each decorated view has its own counters unless `group` is shared.
+def ratelimit(rate, key='user_or_ip', algorithm=SLIDING_WINDOW, methods=('POST',), group=None):
+    limit, period = parse_rate(rate)
+    if algorithm == SLIDING_WINDOW:
+        limiter = SlidingWindowLimiter(limit, period)
+    elif algorithm == TOKEN_BUCKET:
+        limiter = TokenBucketLimiter(limit, limit / period)
+    else:
+        raise ValueError(f'Unknown rate limit algorithm: {algorithm}')
+
+    def decorator(view_func):
+        scope = group or f'{view_func.__module__}.{view_func.__qualname__}'
+
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if request.method in methods:
+                cache_key = f'ratelimit:{scope}:{algorithm}:{request_key(request, key)}'
+                if not limiter.hit(cache_key):
+                    return Response({'error': 'Rate limit exceeded'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            return view_func(request, *args, **kwargs)
+        return wrapped_view
+    return decorator
@@ -0,0 +1,87 @@
+import hashlib
+import time
+
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+
+# Headers stored with the content, ETag/Last-Modified come from @conditional_list
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+
+def generation_key(user_id):
+    return f'responsecache:generation:{user_id}'
+
+
+# Cached responses are keyed by the user's generation, so invalidating them is
+# one increment. A missing counter (new user, or evicted) starts from the
+# current time, above any generation that could still have cached responses.
+def get_generation(user_id):
+    generation = cache.get(generation_key(user_id))
+    if generation is None:
+        generation = time.time_ns()
+        if not cache.add(generation_key(user_id), generation, None):
+            generation = cache.get(generation_key(user_id), generation)
+    return generation
+
+
+def _bump(user_id):
+    try:
+        cache.incr(generation_key(user_id))
+    except ValueError:
+        cache.add(generation_key(user_id), time.time_ns(), None)
+
+
+# Call after any write to the user's rows. Bumped again once the transaction
+# commits, a response read in between could have cached the old rows.
+def bump_generation(user_id):
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def response_key(request, generation, scope):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'responsecache:{request.user.pk}:{generation}:{scope}:{path}'
+
+
+# Caches the rendered JSON of successful GET responses per user, view and query
+# string. A hit is served from the cached bytes without any query or
+# serialization, including the 304 of a conditional request. Place it below
+# @permission_classes and above @conditional_list. Writes must call
+# bump_generation (the models' post_save/post_delete receivers do).
+def cached_response(view_func):
+    scope = f'{view_func.__module__}.{view_func.__qualname__}'
+
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        # The browsable API renders HTML, only JSON is cached
+        if request.method not in ('GET', 'HEAD') or request.accepted_renderer.format != 'json':
+            return view_func(request, *args, **kwargs)
+
+        key = response_key(request, get_generation(request.user.pk), scope)
+        entry = cache.get(key)
+        if entry is not None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            for header, value in entry['headers'].items():
+                response[header] = value
+            last_modified = parse_http_date_safe(entry['headers'].get('Last-Modified', ''))
+            return get_conditional_response(
+                request, etag=entry['headers'].get('ETag'), last_modified=last_modified, response=response
+            )
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            def store(rendered):
+                cache.set(key, {
+                    'content': rendered.content,
+                    'content_type': rendered['Content-Type'],
+                    'headers': {header: rendered[header] for header in CACHED_HEADERS if rendered.has_header(header)},
+                }, settings.RESPONSE_CACHE_TIMEOUT)
+            response.add_post_render_callback(store)
+        return response
+    return wrapped_view
@@ -62,6 +62,7 @@ INSTALLED_APPS = [
     'task',
     'expense',
     'shorturl',
+    'sync',
     
 ]
 
@@ -114,6 +115,23 @@ elif len(sys.argv) > 0 and sys.argv[1] != 'collectstatic':
         'default': dj_database_url.parse(getenv.get('DATABASE_URL')),
     }
 
+# Cache
+# Rate limits, short url resolutions and other counters must be shared between
+# worker processes, set REDIS_URL in production. The local memory cache is per process.
+if getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Email settings #################
 EMAIL_BACKEND = 'django_ses.SESBackend'
 DEFAULT_FROM_EMAIL = getenv('AWS_SES_FROM_EMAIL')
@@ -212,6 +230,10 @@ DJOSER = {
     'PASSWORD_RESET_CONFIRM_RETYPE': True,
     'TOKEN_MODEL': None,
     'SOCIAL_AUTH_ALLOWED_REDIRECT_URIS': getenv('REDIRECT_URLS').split(','),
+    'SERIALIZERS': {
+        'user': 'users.serializers.UserSerializer',
+        'current_user': 'users.serializers.UserSerializer',
+    },
 }
 
 AUTH_COOKIE = 'access'
@@ -258,3 +280,55 @@ CORS_ALLOW_CREDENTIALS = True
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.UserAccount'
+
+# Short urls
+SHORTURL_CODE_BLOCK_SIZE = int(getenv('SHORTURL_CODE_BLOCK_SIZE', '1000'))
+SHORTURL_CACHE_TIMEOUT = int(getenv('SHORTURL_CACHE_TIMEOUT', str(60 * 60)))
+SHORTURL_NEGATIVE_CACHE_TIMEOUT = int(getenv('SHORTURL_NEGATIVE_CACHE_TIMEOUT', '60'))
+SHORTURL_LOCAL_CACHE_SIZE = int(getenv('SHORTURL_LOCAL_CACHE_SIZE', '10000'))
+SHORTURL_LOCAL_CACHE_TIMEOUT = int(getenv('SHORTURL_LOCAL_CACHE_TIMEOUT', '10'))
+SHORTURL_FILTER_ERROR_RATE = float(getenv('SHORTURL_FILTER_ERROR_RATE', '0.01'))
+SHORTURL_FILTER_MIN_CAPACITY = int(getenv('SHORTURL_FILTER_MIN_CAPACITY', '100000'))
+SHORTURL_FILTER_REBUILD_INTERVAL = int(getenv('SHORTURL_FILTER_REBUILD_INTERVAL', str(30 * 60)))
+SHORTURL_CLICK_FLUSH_INTERVAL = int(getenv('SHORTURL_CLICK_FLUSH_INTERVAL', '10'))
+SHORTURL_CLICK_MAX_PENDING = int(getenv('SHORTURL_CLICK_MAX_PENDING', '5000'))
+SHORTURL_BULK_MAX_SIZE = int(getenv('SHORTURL_BULK_MAX_SIZE', '1000'))
+SHORTURL_DEDUP = getenv('SHORTURL_DEDUP', 'False') == 'True'
+
+# Batch endpoints
+BATCH_MAX_OPERATIONS = int(getenv('BATCH_MAX_OPERATIONS', '500'))
+
+# Cached list responses
+RESPONSE_CACHE_TIMEOUT = int(getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Exports
+EXPORT_CHUNK_SIZE = int(getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Expense imports
+IMPORT_BATCH_SIZE = int(getenv('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_MAX_ERRORS = int(getenv('IMPORT_MAX_ERRORS', '100'))
+
+# Task search
+TASK_SEARCH_MAX_TERMS = int(getenv('TASK_SEARCH_MAX_TERMS', '10'))
+
+# Expense statistics
+STATS_MAX_OUTLIERS = int(getenv('STATS_MAX_OUTLIERS', '100'))
+
+# Delta sync
+SYNC_PAGE_SIZE = int(getenv('SYNC_PAGE_SIZE', '500'))
+SYNC_SETTLE_SECONDS = int(getenv('SYNC_SETTLE_SECONDS', '5'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Users cached by the JWT authentication
+USER_CACHE_TIMEOUT = int(getenv('USER_CACHE_TIMEOUT', '60'))
+
+# Revoked tokens
+TOKEN_REVOCATION_SYNC_INTERVAL = float(getenv('TOKEN_REVOCATION_SYNC_INTERVAL', '1'))
+TOKEN_REVOCATION_FILTER_CAPACITY = int(getenv('TOKEN_REVOCATION_FILTER_CAPACITY', '100000'))
+TOKEN_REVOCATION_FILTER_ERROR_RATE = float(getenv('TOKEN_REVOCATION_FILTER_ERROR_RATE', '0.01'))
+
+# Avatars
+AVATAR_MAX_SIZE = int(getenv('AVATAR_MAX_SIZE', str(5 * 1024 * 1024)))
+AVATAR_MAX_PIXELS = int(getenv('AVATAR_MAX_PIXELS', str(40 * 1000 * 1000)))
+AVATAR_WORKERS = int(getenv('AVATAR_WORKERS', '2'))
+AVATAR_PROCESS_TIMEOUT = int(getenv('AVATAR_PROCESS_TIMEOUT', '30'))
@@ -18,6 +18,7 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
+from shorturl.views import redirectShortUrl
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,7 +26,9 @@ urlpatterns = [
     path('api/', include('users.urls')),
     path('api/tasks/', include("task.urls")),
     path('api/expenses/', include("expense.urls")),
-    path('api/shorturls/', include("shorturl.urls"))
+    path('api/shorturls/', include("shorturl.urls")),
+    path('api/sync/', include("sync.urls")),
+    path('s/<str:code>', redirectShortUrl, name='shorturl-redirect'),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Build the short code filter while the server starts, not on the first lookup
+from shorturl.filter import short_code_filter
+
+short_code_filter.start()
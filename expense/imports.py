@@ -0,0 +1,84 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import transaction
+
+from backend.responsecache import bump_generation
+from expense.models import Expense
+from expense.rollups import apply_deltas, to_price
+from expense.validators import validate_expense
+
+
+REQUIRED_COLUMNS = ('label', 'price')
+
+
+class InvalidFile(Exception):
+    pass
+
+
+# Rows imported, rows rejected and the first IMPORT_MAX_ERRORS errors with their line
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    @property
+    def data(self):
+        return {'imported': self.imported, 'failed': self.failed, 'errors': self.errors}
+
+
+# Each batch is committed in its own transaction with its rollups
+def save_batch(user, expenses):
+    with transaction.atomic():
+        created = Expense.objects.bulk_create(expenses)
+        apply_deltas([(user.pk, expense.created_at, expense.price, 1) for expense in created])
+        # bulk_create doesn't send post_save
+        bump_generation(user.pk)
+    return len(created)
+
+
+# Imports the expenses of an uploaded CSV file with a header row containing
+# label and price columns (other columns are ignored). The file is read one
+# line at a time and written every IMPORT_BATCH_SIZE valid rows, so memory
+# depends on the batch size, not the file size. Invalid rows are reported and
+# skipped; batches written before an unreadable line are kept.
+def import_expenses(user, file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = [name.strip().lower() for name in next(reader, [])]
+    except (UnicodeDecodeError, csv.Error):
+        raise InvalidFile('The file should be a UTF-8 CSV file')
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise InvalidFile(f'Missing columns: {", ".join(missing)}')
+    label_index = header.index('label')
+    price_index = header.index('price')
+
+    report = ImportReport()
+    batch = []
+    try:
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            label = row[label_index].strip() if label_index < len(row) else ''
+            price = row[price_index].strip() if price_index < len(row) else ''
+            error = validate_expense(label, price)
+            if error:
+                report.error(reader.line_num, error)
+                continue
+            batch.append(Expense(label=label, price=to_price(price), created_by=user))
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                report.imported += save_batch(user, batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error):
+        report.error(reader.line_num + 1, 'The rest of the file could not be read as UTF-8 CSV')
+    if batch:
+        report.imported += save_batch(user, batch)
+    return report
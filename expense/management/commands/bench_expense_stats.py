@@ -0,0 +1,83 @@
+import random
+import time
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from expense.models import Expense
+from expense.stats import compute, load
+
+
+class Rollback(Exception):
+    pass
+
+
+# Creates --rows expenses spread over --days days for one user, then times the
+# NumPy statistics (split into loading the columns and computing) and the same
+# totals and percentiles computed from model instances in Python.
+# Everything runs in one transaction that is rolled back at the end.
+class Command(BaseCommand):
+    help = 'Benchmark the expense statistics over a large expense history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=5 * 365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        random.seed(0)
+        user = get_user_model().objects.create_user(
+            email='bench-stats@example.com', first_name='Bench', last_name='Stats'
+        )
+        start = time.perf_counter()
+        remaining = options['rows']
+        while remaining > 0:
+            size = min(options['batch_size'], remaining)
+            expenses = Expense.objects.bulk_create(
+                Expense(label='Bench', price=Decimal(random.randint(1, 10 ** 7)) / 10000, created_by=user)
+                for i in range(size)
+            )
+            # created_at is auto_now_add, spread the batch over the history afterwards
+            Expense.objects.filter(pk__in=[expense.pk for expense in expenses]).update(
+                created_at=timezone.now() - timedelta(days=random.randrange(options['days']))
+            )
+            remaining -= size
+        self.stdout.write(f"Created {options['rows']} expenses in {time.perf_counter() - start:.1f}s")
+
+        expenses = user.expense_set.all()
+        start = time.perf_counter()
+        columns = load(expenses)
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        stats = compute(*columns, 7)
+        compute_time = time.perf_counter() - start
+        self.stdout.write(
+            f'NumPy: {load_time + compute_time:.2f}s ({load_time:.2f}s loading the columns, '
+            f'{compute_time:.3f}s computing), total {stats["total"]}'
+        )
+
+        start = time.perf_counter()
+        daily = defaultdict(Decimal)
+        prices = []
+        for expense in expenses.iterator(chunk_size=5000):
+            daily[timezone.localtime(expense.created_at).date()] += expense.price
+            prices.append(expense.price)
+        prices.sort()
+        percentiles = [prices[len(prices) * percentile // 100] for percentile in (50, 90, 95, 99)]
+        self.stdout.write(
+            f'Python over model instances (daily totals and percentiles only): '
+            f'{time.perf_counter() - start:.2f}s, total {sum(daily.values())}'
+        )
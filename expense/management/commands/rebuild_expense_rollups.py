@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+from expense.models import Expense, ExpenseRollup
+
+
+# Recomputes the day and month rollups from the expenses, one user per
+# transaction. Use it to backfill the rollups or to repair them; expenses
+# written for a user while that user is being rebuilt can make it fail, run it again then.
+class Command(BaseCommand):
+    help = 'Recompute the expense rollups from the expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+
+    def handle(self, *args, **options):
+        if options['user'] is not None:
+            user_ids = [options['user']]
+        else:
+            user_ids = set(Expense.objects.values_list('created_by', flat=True).distinct())
+            user_ids |= set(ExpenseRollup.objects.values_list('user', flat=True).distinct())
+            user_ids = sorted(user_ids)
+
+        periods = (
+            (ExpenseRollup.DAY, TruncDate('created_at')),
+            (ExpenseRollup.MONTH, TruncMonth('created_at', output_field=DateField())),
+        )
+        for user_id in user_ids:
+            with transaction.atomic():
+                ExpenseRollup.objects.filter(user_id=user_id).delete()
+                rollups = []
+                for period, period_start in periods:
+                    rows = (
+                        Expense.objects.filter(created_by_id=user_id)
+                        .annotate(period_start=period_start)
+                        .values('period_start')
+                        .annotate(total=Sum('price'), count=Count('id'))
+                        .order_by()
+                    )
+                    rollups += [
+                        ExpenseRollup(user_id=user_id, period=period, **row)
+                        for row in rows
+                    ]
+                ExpenseRollup.objects.bulk_create(rollups, batch_size=500)
+        self.stdout.write(f'Rebuilt the expense rollups of {len(user_ids)} users')
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expense", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="expense_owner_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("expense", "0002_owner_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpenseRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "Day"), ("month", "Month")], max_length=5
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=23),
+                ),
+                ("count", models.BigIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="expenserollup",
+            constraint=models.UniqueConstraint(
+                fields=("user", "period", "period_start"),
+                name="expense_rollup_period_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:13
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+# Sync reads rows by updated_at, rows saved before it was set get one
+def backfill_updated_at(apps, schema_editor):
+    Expense = apps.get_model("expense", "Expense")
+    Expense.objects.filter(updated_at__isnull=True).update(
+        updated_at=Coalesce("created_at", Now())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("expense", "0003_rollups"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["created_by", "updated_at", "id"],
+                name="expense_owner_updated_idx",
+            ),
+        ),
+    ]
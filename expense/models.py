@@ -5,8 +5,35 @@ class Expense(models.Model):
     label = models.CharField(max_length=205)
     price = models.DecimalField(max_digits=19, decimal_places=4)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
-    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at', 'id'], name='expense_owner_created_idx'),
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='expense_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return self.label
+
+
+# Expense totals per user and day/month, kept up to date by expense/rollups.py
+class ExpenseRollup(models.Model):
+    DAY = 'day'
+    MONTH = 'month'
+    PERIOD_CHOICES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    total = models.DecimalField(max_digits=23, decimal_places=4, default=0)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'period_start'], name='expense_rollup_period_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.period} {self.period_start}: {self.total}'
@@ -0,0 +1,59 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from expense.models import ExpenseRollup
+
+
+PRICE_QUANTUM = Decimal('0.0001')
+TOTAL_FIELD = DecimalField(max_digits=23, decimal_places=4)
+
+
+# Prices are stored with 4 decimal places, rollups must add the stored value
+def to_price(value):
+    return Decimal(str(value)).quantize(PRICE_QUANTUM)
+
+
+def period_starts(created_at):
+    day = timezone.localtime(created_at).date()
+    return {ExpenseRollup.DAY: day, ExpenseRollup.MONTH: day.replace(day=1)}
+
+
+# Applies changes to the rollups, each delta is (user id, created_at, amount, count):
+# a create is (user, created_at, price, 1), a delete (user, created_at, -price, -1)
+# and a price change (user, created_at, new - old, 0).
+# Call it inside the transaction that writes the expenses. It runs two queries
+# however many deltas there are (one more per 500 touched periods).
+def apply_deltas(deltas):
+    changes = defaultdict(lambda: [Decimal(0), 0])
+    for user_id, created_at, amount, count in deltas:
+        for period, period_start in period_starts(created_at).items():
+            change = changes[(user_id, period, period_start)]
+            change[0] += to_price(amount)
+            change[1] += count
+    changes = {key: change for key, change in changes.items() if change != [0, 0]}
+    if not changes:
+        return
+
+    # Insert missing rows, then add to them in place, concurrent writers for the
+    # same user and period can't overwrite each other's totals
+    ExpenseRollup.objects.bulk_create(
+        [ExpenseRollup(user_id=user_id, period=period, period_start=period_start) for user_id, period, period_start in changes],
+        ignore_conflicts=True,
+    )
+    keys = list(changes)
+    for start in range(0, len(keys), 500):
+        match = Q()
+        total_whens = []
+        count_whens = []
+        for user_id, period, period_start in keys[start:start + 500]:
+            condition = Q(user_id=user_id, period=period, period_start=period_start)
+            amount, count = changes[(user_id, period, period_start)]
+            match |= condition
+            total_whens.append(When(condition, then=Value(amount, output_field=TOTAL_FIELD)))
+            count_whens.append(When(condition, then=Value(count)))
+        ExpenseRollup.objects.filter(match).update(
+            total=F('total') + Case(*total_whens, default=Value(0, output_field=TOTAL_FIELD), output_field=TOTAL_FIELD),
+            count=F('count') + Case(*count_whens, default=Value(0)),
+        )
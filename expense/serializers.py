@@ -1,7 +1,24 @@
-from rest_framework.serializers import ModelSerializer
-from expense.models import Expense
+from decimal import Decimal
+from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from backend.serializers import ValuesSerializer
+from expense.models import Expense, ExpenseRollup
 
 class ExpenseSerializer(ModelSerializer):
   class Meta:
     model = Expense
-    fields = "__all__"
\ No newline at end of file
+    fields = "__all__"
+
+
+# Same output for lists, without model instances
+expense_values = ValuesSerializer(ExpenseSerializer)
+
+
+class ExpenseRollupSerializer(ModelSerializer):
+  average = SerializerMethodField()
+
+  class Meta:
+    model = ExpenseRollup
+    fields = ['period', 'period_start', 'total', 'count', 'average']
+
+  def get_average(self, rollup):
+    return str((rollup.total / rollup.count).quantize(Decimal('0.0001')))
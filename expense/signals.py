@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.conditional import record_deletion
+from backend.responsecache import bump_generation
+from expense.models import Expense
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, **kwargs):
+    bump_generation(instance.created_by_id)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, **kwargs):
+    record_deletion(Expense, instance.created_by_id)
+    bump_generation(instance.created_by_id)
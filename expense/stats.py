@@ -0,0 +1,160 @@
+from datetime import datetime
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+
+from django.conf import settings
+from django.utils import timezone
+
+# Prices are handled as integer counts of 1/10000 (the 4 decimal places of
+# Expense.price), so sums are exact. They are int64 arrays unless the sum of
+# the prices could overflow int64 (prices go up to 10 ** 15, 10 ** 19 units),
+# then the arrays hold Python ints. Averages and percentiles are rounded back
+# to whole units, every amount is returned as a Decimal string like the API's.
+UNITS = 10 ** 4
+INT64_MAX = np.iinfo(np.int64).max
+PERCENTILES = [50, 90, 95, 99]
+# Tukey's fences, prices further than this many interquartile ranges outside
+# the quartiles are outliers
+OUTLIER_RANGE = 1.5
+
+
+def to_price(units):
+    return '{:f}'.format(Decimal(int(units)).scaleb(-4))
+
+
+# Local days of UTC epoch seconds in the current timezone (like the rollups).
+# UTC offsets only change on quarter hours, the offset is looked up once per
+# distinct quarter hour instead of once per expense.
+def local_days(timestamps):
+    zone = timezone.get_current_timezone()
+    quarters = (timestamps // (15 * 60)).astype(np.int64)
+    distinct, inverse = np.unique(quarters, return_inverse=True)
+    offsets = np.array(
+        [datetime.fromtimestamp(int(quarter) * 15 * 60, zone).utcoffset().total_seconds() for quarter in distinct]
+    )
+    seconds = (timestamps + offsets[inverse]).astype(np.int64)
+    return seconds.astype('datetime64[s]').astype('datetime64[D]')
+
+
+# int64 when every sum of the units fits, Python ints otherwise
+def units_array(units):
+    dtype = np.int64 if sum(abs(value) for value in units) <= INT64_MAX else object
+    return np.array(units, dtype=dtype)
+
+
+# value / divisor rounded half to even, like np.rint but exact for Python ints
+def divide(values, divisor):
+    if values.dtype != object:
+        return np.rint(values / divisor)
+    return np.array([round(Fraction(value, divisor)) for value in values], dtype=object)
+
+
+# (ids, days, units) arrays of the expenses, ordered by day.
+# The day is computed here rather than with TruncDate, which SQLite runs as a
+# Python function per row. Prices are converted here too, the database would
+# have to hold the units in a bigint.
+def load(expenses):
+    rows = list(expenses.order_by('created_at', 'id').values_list('id', 'created_at', 'price'))
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64)
+    ids, created, prices = zip(*rows)
+    timestamps = np.fromiter((value.timestamp() for value in created), dtype=np.float64, count=len(created))
+    days = local_days(timestamps)
+    # A day can go back where the offset changes at midnight
+    order = np.argsort(days, kind='stable')
+    units = units_array([int(price.scaleb(4).to_integral_value()) for price in prices])
+    return np.array(ids, dtype=np.int64)[order], days[order], units[order]
+
+
+# Sums of the units per period, for every period from the first to the last.
+# periods is sorted, the sums stay in the units' type (bincount would go through float64).
+def totals_by_period(periods, units):
+    first = periods[0]
+    positions = (periods - first).astype(np.int64)
+    starts = np.flatnonzero(np.diff(positions, prepend=-1))
+    totals = np.zeros(positions[-1] + 1, dtype=units.dtype)
+    totals[positions[starts]] = np.add.reduceat(units, starts)
+    return first, totals
+
+
+# Totals per day, with days without expenses, and their trailing moving average
+# over `window` days (None until a full window is available)
+def daily(days, units, window):
+    first, totals = totals_by_period(days, units)
+    sums = np.cumsum(np.concatenate(([0], totals)))
+    averages = divide(sums[window:] - sums[:-window], window) if len(totals) >= window else np.array([])
+    dates = first + np.arange(len(totals))
+    return [
+        {
+            'date': str(date),
+            'total': to_price(total),
+            'moving_average': to_price(averages[index - window + 1]) if index >= window - 1 else None,
+        }
+        for index, (date, total) in enumerate(zip(dates, totals))
+    ]
+
+
+# Totals per month and their change from the previous month
+def monthly(days, units):
+    first, totals = totals_by_period(days.astype('datetime64[M]'), units)
+    deltas = np.diff(totals, prepend=0)
+    result = []
+    for index, (total, delta) in enumerate(zip(totals, deltas)):
+        previous = totals[index - 1] if index else 0
+        result.append({
+            'month': str(first + index),
+            'total': to_price(total),
+            'delta': to_price(delta) if index else None,
+            'change': round(float(delta / previous), 4) if previous else None,
+        })
+    return result
+
+
+# The fences and the median are float64, exact up to 2 ** 53 units
+def outliers(ids, days, units, q1, q3):
+    spread = OUTLIER_RANGE * (q3 - q1)
+    lower, upper = np.floor(q1 - spread), np.ceil(q3 + spread)
+    flagged = np.flatnonzero((units < lower) | (units > upper))
+    # The furthest from the median first
+    median = np.median(units.astype(np.float64))
+    distances = np.abs(units[flagged].astype(np.float64) - median)
+    flagged = flagged[np.argsort(-distances, kind='stable')]
+    return {
+        'lower': to_price(max(lower, 0)),
+        'upper': to_price(upper),
+        'count': len(flagged),
+        'expenses': [
+            {'id': int(ids[index]), 'date': str(days[index]), 'price': to_price(units[index])}
+            for index in flagged[:settings.STATS_MAX_OUTLIERS]
+        ],
+    }
+
+
+# Statistics of the expenses queryset: count, total, mean, price percentiles,
+# daily totals with a moving average, month over month changes and outliers.
+def expense_stats(expenses, window=7):
+    return compute(*load(expenses), window)
+
+
+def compute(ids, days, units, window):
+    if not len(units):
+        return {
+            'count': 0, 'total': to_price(0), 'mean': None, 'percentiles': {},
+            'daily': [], 'monthly': [], 'outliers': None,
+        }
+
+    total = int(units.sum())
+    percentiles = np.percentile(units.astype(np.float64), PERCENTILES + [25, 75])
+    return {
+        'count': len(units),
+        'total': to_price(total),
+        'mean': '{:f}'.format((Decimal(total) / len(units) / UNITS).quantize(Decimal('0.0001'))),
+        'percentiles': {
+            f'p{percentile}': to_price(np.rint(value)) for percentile, value in zip(PERCENTILES, percentiles)
+        },
+        'daily': daily(days, units, window),
+        'monthly': monthly(days, units),
+        'outliers': outliers(ids, days, units, percentiles[-2], percentiles[-1]),
+    }
@@ -1,3 +1,244 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from expense.models import Expense, ExpenseRollup
+from expense.serializers import ExpenseSerializer, expense_values
+from expense.validators import PRICE_MAX
+
+
+class ExpenseRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='expenses@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rollups(self):
+        return {
+            (rollup.period, rollup.period_start): (rollup.total, rollup.count)
+            for rollup in ExpenseRollup.objects.filter(user=self.user, count__gt=0)
+        }
+
+    def test_writes_keep_rollups_up_to_date(self):
+        first = self.client.post('/api/expenses/', {'label': 'Food', 'price': '10.50'}, format='json').data
+        self.client.post('/api/expenses/', {'label': 'Rent', 'price': '100'}, format='json')
+        self.client.put(f'/api/expenses/{first["id"]}', {'label': 'Food', 'price': '12.25'}, format='json')
+
+        today = timezone.localdate()
+        response = self.client.get('/api/expenses/summary/?period=day')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['period_start'], today.isoformat())
+        self.assertEqual(response.data[0]['total'], '112.2500')
+        self.assertEqual(response.data[0]['count'], 2)
+        self.assertEqual(response.data[0]['average'], '56.1250')
+
+        self.client.delete(f'/api/expenses/{first["id"]}')
+        month = self.rollups()[(ExpenseRollup.MONTH, today.replace(day=1))]
+        self.assertEqual(month, (Decimal('100'), 1))
+
+    def test_invalid_expense_does_not_change_rollups(self):
+        response = self.client.post('/api/expenses/', {'label': 'Food', 'price': 'inf'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.rollups(), {})
+
+    def test_summary_filters(self):
+        self.client.post('/api/expenses/', {'label': 'Food', 'price': '10'}, format='json')
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.get(f'/api/expenses/summary/?period=day&from={tomorrow}').data, [])
+        self.assertEqual(len(self.client.get(f'/api/expenses/summary/?to={tomorrow}').data), 1)
+        self.assertEqual(self.client.get('/api/expenses/summary/?period=week').status_code, 400)
+        self.assertEqual(self.client.get('/api/expenses/summary/?from=yesterday').status_code, 400)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for price in ['1.1', '2.2', '3.3']:
+            self.client.post('/api/expenses/', {'label': 'Food', 'price': price}, format='json')
+        # Older expenses, as written before the rollups existed
+        last_month = timezone.now() - timedelta(days=40)
+        Expense.objects.bulk_create(
+            Expense(label='Old', price=Decimal('5'), created_by=self.user) for i in range(2)
+        )
+        Expense.objects.filter(label='Old').update(created_at=last_month)
+
+        call_command('rebuild_expense_rollups', stdout=StringIO())
+        rollups = self.rollups()
+        today = timezone.localdate()
+        self.assertEqual(rollups[(ExpenseRollup.DAY, today)], (Decimal('6.6'), 3))
+        old_month = timezone.localtime(last_month).date().replace(day=1)
+        self.assertEqual(rollups[(ExpenseRollup.MONTH, old_month)], (Decimal('10'), 2))
+        self.assertEqual(len(rollups), 4)
+
+
+class ExpenseBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='batch@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_updates_rollups(self):
+        first = self.client.post('/api/expenses/', {'label': 'Food', 'price': '10'}, format='json').data
+        second = self.client.post('/api/expenses/', {'label': 'Rent', 'price': '100'}, format='json').data
+        response = self.client.post('/api/expenses/batch/', {'operations': [
+            {'op': 'create', 'label': 'Taxi', 'price': '7.5'},
+            {'op': 'create', 'label': 'Taxi', 'price': '-1'},
+            {'op': 'update', 'id': first['id'], 'label': 'Food', 'price': 12},
+            {'op': 'delete', 'id': second['id']},
+            {'op': 'delete', 'id': second['id']},
+        ]}, format='json')
+        results = response.data['results']
+        self.assertEqual(results[0]['price'], '7.5000')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['price'], '12.0000')
+        self.assertEqual(results[3], {'id': second['id'], 'deleted': True})
+        self.assertIn('error', results[4])
+
+        rollup = ExpenseRollup.objects.get(user=self.user, period=ExpenseRollup.DAY)
+        self.assertEqual((rollup.total, rollup.count), (Decimal('19.5'), 2))
+
+
+class ExpenseValuesSerializerTests(TestCase):
+    def test_same_json_as_serializer(self):
+        user = get_user_model().objects.create_user(email='values@example.com', first_name='A', last_name='B')
+        for price in ['0.1', '12345.6789', '1', '99999999999.0001']:
+            Expense.objects.create(label='Food', price=Decimal(price), created_by=user)
+        expenses = Expense.objects.order_by('id')
+        renderer = JSONRenderer()
+        for zone in ['UTC', 'Europe/Skopje']:
+            with timezone.override(zone):
+                rows = expense_values.serialize(expense_values.queryset(expenses))
+                expected = ExpenseSerializer(expenses, many=True).data
+                # Field by field, in the same order
+                self.assertEqual([list(row.items()) for row in rows], [list(row.items()) for row in expected])
+                self.assertEqual(renderer.render(rows), renderer.render(expected))
+
+
+class ExpenseImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='import@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content):
+        file = SimpleUploadedFile('expenses.csv', content, content_type='text/csv')
+        return self.client.post('/api/expenses/import/', {'file': file}, format='multipart')
+
+    @override_settings(IMPORT_BATCH_SIZE=2)
+    def test_import_in_batches(self):
+        response = self.upload(
+            '\ufeffDate,Label,Price\n'
+            '2023-01-01,Food,10.5\n'
+            '2023-01-02,Not valid!,3\n'
+            '\n'
+            '2023-01-03,Rent,100\n'
+            '2023-01-04,Taxi,-2\n'
+            '2023-01-05,Taxi,7\n'.encode()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 6])
+        self.assertEqual(
+            sorted(Expense.objects.filter(created_by=self.user).values_list('label', flat=True)), ['Food', 'Rent', 'Taxi']
+        )
+        rollup = ExpenseRollup.objects.get(user=self.user, period=ExpenseRollup.MONTH)
+        self.assertEqual((rollup.total, rollup.count), (Decimal('117.5'), 3))
+
+    @override_settings(IMPORT_MAX_ERRORS=2)
+    def test_errors_are_capped(self):
+        response = self.upload(b'label,price\n' + b'Food,x\n' * 5)
+        self.assertEqual(response.data['failed'], 5)
+        self.assertEqual(len(response.data['errors']), 2)
+
+    def test_invalid_files(self):
+        self.assertEqual(self.upload(b'name,amount\nFood,1\n').status_code, 400)
+        self.assertEqual(self.upload(b'\xff\xfe').status_code, 400)
+        self.assertEqual(self.client.post('/api/expenses/import/', {}, format='multipart').status_code, 400)
+
+
+class ExpenseStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='stats@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now().replace(year=2023, month=1, day=30, hour=12)
+        prices = ['10.1', '20.2', '30.3', '40.4', '1000', '0.0001']
+        expenses = Expense.objects.bulk_create(
+            Expense(label='Food', price=Decimal(price), created_by=self.user) for price in prices
+        )
+        for day, expense in zip([0, 0, 1, 2, 3, 5], expenses):
+            Expense.objects.filter(pk=expense.pk).update(created_at=self.start + timedelta(days=day))
+        self.outlier = expenses[4]
+
+    def test_stats(self):
+        stats = self.client.get('/api/expenses/stats/?window=2').json()
+        self.assertEqual(stats['count'], 6)
+        self.assertEqual(stats['total'], '1101.0001')
+        self.assertEqual(stats['mean'], '183.5000')
+        self.assertEqual(stats['percentiles']['p50'], '25.2500')
+        self.assertEqual(
+            [(day['date'], day['total'], day['moving_average']) for day in stats['daily']],
+            [
+                ('2023-01-30', '30.3000', None),
+                ('2023-01-31', '30.3000', '30.3000'),
+                ('2023-02-01', '40.4000', '35.3500'),
+                ('2023-02-02', '1000.0000', '520.2000'),
+                ('2023-02-03', '0.0000', '500.0000'),
+                ('2023-02-04', '0.0001', '0.0000'),
+            ],
+        )
+        self.assertEqual(
+            [(month['month'], month['total'], month['delta'], month['change']) for month in stats['monthly']],
+            [('2023-01', '60.6000', None, None), ('2023-02', '1040.4001', '979.8001', 16.1683)],
+        )
+        self.assertEqual(stats['outliers']['count'], 1)
+        self.assertEqual(stats['outliers']['expenses'][0]['id'], self.outlier.id)
+
+    def test_prices_near_the_maximum_are_summed_exactly(self):
+        # 10 ** 19 units, more than int64 holds (SQLite can't store the 4 decimals on top)
+        price = Decimal(PRICE_MAX - 1)
+        Expense.objects.filter(created_by=self.user).delete()
+        expenses = Expense.objects.bulk_create(
+            Expense(label='Food', price=value, created_by=self.user) for value in [price, price, Decimal('1')]
+        )
+        for day, expense in zip([0, 0, 1], expenses):
+            Expense.objects.filter(pk=expense.pk).update(created_at=self.start + timedelta(days=day))
+        response = self.client.get('/api/expenses/stats/?window=2')
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+
+        def amount(value):
+            return '{:f}'.format(value.quantize(Decimal('0.0001')))
+
+        self.assertEqual(stats['total'], amount(price * 2 + 1))
+        self.assertEqual(stats['mean'], amount((price * 2 + 1) / 3))
+        self.assertEqual(
+            [(day['total'], day['moving_average']) for day in stats['daily']],
+            [(amount(price * 2), None), (amount(Decimal(1)), amount(price + Decimal('0.5')))],
+        )
+        self.assertEqual(stats['monthly'][0]['total'], amount(price * 2 + 1))
+
+    def test_days_are_local(self):
+        with timezone.override('Pacific/Kiritimati'):
+            stats = self.client.get('/api/expenses/stats/').json()
+        # 12:00 UTC is 02:00 the next day at UTC+14
+        self.assertEqual(stats['daily'][0]['date'], '2023-01-31')
+
+    def test_date_range(self):
+        stats = self.client.get('/api/expenses/stats/?from=2023-02-01&to=2023-02-02').json()
+        self.assertEqual((stats['count'], stats['total']), (2, '1040.4000'))
+        empty = self.client.get('/api/expenses/stats/?from=2024-01-01').json()
+        self.assertEqual((empty['count'], empty['daily']), (0, []))
+        self.assertEqual(self.client.get('/api/expenses/stats/?window=0').status_code, 400)
@@ -1,8 +1,13 @@
 from django.urls import path
-from expense.views import expense, expenses
+from expense.views import expense, expense_summary, expenses, expenses_batch, expenses_export, expenses_import, expenses_stats
 
 urlpatterns = [
     path('', expenses, name='expenses'),
+    path('batch/', expenses_batch, name='expenses-batch'),
+    path('export/<str:fmt>/', expenses_export, name='expenses-export'),
+    path('import/', expenses_import, name='expenses-import'),
+    path('stats/', expenses_stats, name='expenses-stats'),
+    path('summary/', expense_summary, name='expense-summary'),
     path('<int:id>', expense),
 
 ]
\ No newline at end of file
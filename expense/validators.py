@@ -0,0 +1,34 @@
+import math
+
+from expense.models import Expense
+
+
+LABEL_MAX_LENGTH = Expense._meta.get_field('label').max_length
+# Digits allowed before the decimal point
+PRICE_MAX = 10 ** (Expense._meta.get_field('price').max_digits - Expense._meta.get_field('price').decimal_places)
+
+
+# Input rules for an expense, returns an error message or None
+def validate_expense(label, price):
+    # Sanitize and validate input
+    if not label or not price:
+        return 'Label and price are required'
+
+    # Ensure label contains only alphanumeric characters
+    if not isinstance(label, str) or not label.replace(" ", "").isalnum():
+        return 'Label should contain only alphanumeric characters'
+    if len(label) > LABEL_MAX_LENGTH:
+        return f'Label should be at most {LABEL_MAX_LENGTH} characters'
+
+    # Ensure price is a positive number
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return 'Invalid price format'
+    if not math.isfinite(price):
+        return 'Invalid price format'
+    if price <= 0:
+        return 'Price should be a positive number'
+    if price >= PRICE_MAX:
+        return 'Price is too large'
+    return None
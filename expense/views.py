@@ -1,60 +1,235 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from expense.serializers import ExpenseSerializer
-from expense.models import Expense
+from backend.batch import CREATE, DELETE, NOT_FOUND, parse_operations
+from backend.conditional import conditional_list
+from backend.export import export_response
+from backend.pagination import KeysetPagination
+from backend.ratelimit import ratelimit
+from backend.responsecache import bump_generation, cached_response
+from backend.serializers import sparse_fields
+from expense.imports import InvalidFile, import_expenses
+from expense.stats import expense_stats
+from expense.serializers import ExpenseSerializer, ExpenseRollupSerializer, expense_values
+from expense.models import Expense, ExpenseRollup
+from expense.rollups import apply_deltas, to_price
+from expense.validators import validate_expense
+
 
 # Expenses endpoints
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@ratelimit('60/m', key='user')
+@cached_response
+@conditional_list(lambda request: request.user.expense_set.all())
 def expenses(request):
     if request.method == "GET":
         user = request.user
         expenses = user.expense_set.all()
-        serializer = ExpenseSerializer(expenses, many=True)
-        return Response(serializer.data)
+        values = sparse_fields(expense_values, request)
+        # Paginated when the client asks for it with ?page_size= or ?cursor=,
+        # the pagination key is read even when it isn't one of the fields
+        rows = values.queryset(expenses, 'created_at', 'id')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(rows, request)
+        if page is not None:
+            return paginator.get_paginated_response(values.serialize(page))
+        return Response(values.serialize(rows))
     
     if request.method == "POST":
-        label = request.data.get('label')
-        price = request.data.get('price')
-
-        # Sanitize and validate input
-        if not label or not price:
-            return Response({'error': 'Label and price are required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Ensure label contains only alphanumeric characters
-        if not label.replace(" ", "").isalnum():
-            return Response({'error': 'Label should contain only alphanumeric characters'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Ensure price is a positive number
-        try:
-            price = float(price)
-            if price <= 0:
-                return Response({'error': 'Price should be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
-        except ValueError:
-            return Response({'error': 'Invalid price format'}, status=status.HTTP_400_BAD_REQUEST)
-
-        expense = Expense.objects.create(
-            label = request.data['label'],
-            price = request.data['price'],
-            created_by = request.user
-        )
+        error = validate_expense(request.data.get('label'), request.data.get('price'))
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            expense = Expense.objects.create(
+                label = request.data['label'],
+                price = request.data['price'],
+                created_by = request.user
+            )
+            apply_deltas([(expense.created_by_id, expense.created_at, expense.price, 1)])
         serializer = ExpenseSerializer(expense, many=False)
         return Response(serializer.data)
 
+# Runs in one transaction with the expense row locked, so the rollup
+# change is based on the price that is actually replaced/deleted
 @api_view(['PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def expense(request, id):
-    expense = Expense.objects.get(pk=id)
+    expense = Expense.objects.select_for_update().get(pk=id)
     if request.method == "PUT":
+        error = validate_expense(request.data.get('label'), request.data.get('price'))
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        old_price = expense.price
         expense.label = request.data['label']
         expense.price = request.data['price']
         expense.save()
+        apply_deltas([(expense.created_by_id, expense.created_at, to_price(expense.price) - to_price(old_price), 0)])
 
         serializer = ExpenseSerializer(expense, many=False)
         return Response(serializer.data)
     
     if request.method == "DELETE":
+        apply_deltas([(expense.created_by_id, expense.created_at, -expense.price, -1)])
         expense.delete()
         return Response("Expense deleted")
+
+
+# Downloads all the user's expenses as /export/csv/ or /export/ndjson/, streamed,
+# ?fields= picks the columns
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@ratelimit('10/m', key='user', methods=('GET',))
+def expenses_export(request, fmt):
+    expenses = request.user.expense_set.order_by('created_at', 'id')
+    return export_response(sparse_fields(expense_values, request), expenses, fmt, 'expenses')
+
+
+# Imports expenses from a CSV file uploaded as `file` (multipart), see
+# expense/imports.py for the format. Returns the number of imported and
+# rejected rows with the errors per line.
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@ratelimit('5/m', key='user')
+def expenses_import(request):
+    file = request.FILES.get('file')
+    if file is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        report = import_expenses(request.user, file)
+    except InvalidFile as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report.data)
+
+
+# Creates, updates and deletes many expenses in one transaction, see
+# backend/batch.py for the body. Results are per operation: the expense,
+# {"id": .., "deleted": true} or {"error": ..}. Expenses of other users are not
+# found. The number of queries doesn't depend on the number of operations.
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@ratelimit('10/m', key='user')
+def expenses_batch(request):
+    operations, results, error = parse_operations(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    creates = []
+    updates = {}
+    deletes = {}
+    for index, operation in enumerate(operations):
+        if results[index] is not None:
+            continue
+        if operation['op'] == DELETE:
+            deletes[operation['id']] = index
+            continue
+        error = validate_expense(operation.get('label'), operation.get('price'))
+        if error:
+            results[index] = {'error': error}
+        elif operation['op'] == CREATE:
+            creates.append(index)
+        else:
+            updates[operation['id']] = index
+
+    with transaction.atomic():
+        owned = {}
+        if updates or deletes:
+            owned = Expense.objects.select_for_update().filter(created_by=request.user).in_bulk([*updates, *deletes])
+
+        deltas = []
+        # bulk_update doesn't run auto_now, updated_at is set here
+        now = timezone.now()
+        updated = []
+        for id, index in updates.items():
+            expense = owned.get(id)
+            if expense is None:
+                results[index] = NOT_FOUND
+                continue
+            price = to_price(operations[index]['price'])
+            deltas.append((expense.created_by_id, expense.created_at, price - expense.price, 0))
+            expense.label = operations[index]['label']
+            expense.price = price
+            expense.updated_at = now
+            updated.append((index, expense))
+        if updated:
+            Expense.objects.bulk_update([expense for index, expense in updated], ['label', 'price', 'updated_at'])
+
+        created = Expense.objects.bulk_create([
+            Expense(label=operations[index]['label'], price=to_price(operations[index]['price']), created_by=request.user)
+            for index in creates
+        ])
+        deltas += [(expense.created_by_id, expense.created_at, expense.price, 1) for expense in created]
+
+        deleted = [id for id in deletes if id in owned]
+        for id, index in deletes.items():
+            results[index] = {'id': id, 'deleted': True} if id in owned else NOT_FOUND
+        deltas += [(owned[id].created_by_id, owned[id].created_at, -owned[id].price, -1) for id in deleted]
+        if deleted:
+            Expense.objects.filter(created_by=request.user, pk__in=deleted).delete()
+
+        apply_deltas(deltas)
+        # bulk_create and bulk_update don't send post_save
+        bump_generation(request.user.pk)
+
+    for index, expense in zip(creates, created):
+        results[index] = ExpenseSerializer(expense).data
+    for index, expense in updated:
+        results[index] = ExpenseSerializer(expense).data
+    return Response({'results': results})
+
+
+# Totals, counts and averages per day or month, read from the rollups
+# (one row per period) instead of the expenses
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def expense_summary(request):
+    period = request.query_params.get('period', ExpenseRollup.MONTH)
+    if period not in (ExpenseRollup.DAY, ExpenseRollup.MONTH):
+        return Response({'error': 'period should be day or month'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rollups = ExpenseRollup.objects.filter(user=request.user, period=period, count__gt=0)
+    for param, lookup in (('from', 'period_start__gte'), ('to', 'period_start__lte')):
+        if param in request.query_params:
+            value = parse_date(request.query_params[param])
+            if value is None:
+                return Response({'error': f'{param} should be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+            rollups = rollups.filter(**{lookup: value})
+
+    serializer = ExpenseRollupSerializer(rollups.order_by('period_start'), many=True)
+    return Response(serializer.data)
+
+
+# Price statistics of the user's expenses computed with NumPy, see expense/stats.py.
+# ?from= and ?to= (dates) limit the expenses, ?window= is the number of days
+# of the moving average.
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_response
+def expenses_stats(request):
+    expenses = Expense.objects.filter(created_by=request.user)
+    # Compared as local day boundaries, so the (created_by, created_at) index is used
+    for param, lookup, days in (('from', 'created_at__gte', 0), ('to', 'created_at__lt', 1)):
+        if param in request.query_params:
+            value = parse_date(request.query_params[param])
+            if value is None:
+                return Response({'error': f'{param} should be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+            boundary = timezone.make_aware(datetime.combine(value + timedelta(days=days), time.min))
+            expenses = expenses.filter(**{lookup: boundary})
+
+    try:
+        window = int(request.query_params.get('window', 7))
+    except ValueError:
+        window = 0
+    if not 1 <= window <= 365:
+        return Response({'error': 'window should be a number of days between 1 and 365'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(expense_stats(expenses, window))
@@ -0,0 +1,120 @@
+import atexit
+import logging
+import threading
+import time
+
+from collections import Counter
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from backend.responsecache import bump_generation
+from shorturl.models import ShortUrl, ShortUrlClicks
+
+
+logger = logging.getLogger(__name__)
+
+# Keys per UPDATE statement when flushing
+FLUSH_BATCH_SIZE = 500
+
+
+def bucket_for(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+# Adds the counts, keyed by (short url id, hourly bucket), to the click
+# tables. The number of queries depends on the number of keys, not on the
+# number of clicks.
+def write_clicks(counts):
+    ids = {short_url_id for short_url_id, bucket in counts}
+    with transaction.atomic():
+        # Short urls deleted since the clicks were recorded are skipped
+        rows = list(ShortUrl.objects.filter(pk__in=ids).values_list('pk', 'created_by', 'max_hits'))
+        owners = {pk: created_by for pk, created_by, max_hits in rows}
+        # Hits of short urls with max_hits are already counted by check_limits
+        limited = {pk for pk, created_by, max_hits in rows if max_hits is not None}
+        counts = {key: hits for key, hits in counts.items() if key[0] in owners}
+        if not counts:
+            return
+
+        # Create missing bucket rows first, then increment in place so that
+        # concurrent flushes from other workers add up instead of overwriting
+        ShortUrlClicks.objects.bulk_create(
+            [ShortUrlClicks(short_url_id=short_url_id, bucket=bucket) for short_url_id, bucket in counts],
+            ignore_conflicts=True,
+        )
+        keys = list(counts)
+        for start in range(0, len(keys), FLUSH_BATCH_SIZE):
+            batch = keys[start:start + FLUSH_BATCH_SIZE]
+            match = Q()
+            whens = []
+            for short_url_id, bucket in batch:
+                match |= Q(short_url_id=short_url_id, bucket=bucket)
+                whens.append(When(short_url_id=short_url_id, bucket=bucket, then=Value(counts[(short_url_id, bucket)])))
+            ShortUrlClicks.objects.filter(match).update(hits=F('hits') + Case(*whens, default=Value(0)))
+
+        totals = Counter()
+        for (short_url_id, bucket), hits in counts.items():
+            if short_url_id not in limited:
+                totals[short_url_id] += hits
+        if totals:
+            ShortUrl.objects.filter(pk__in=totals).update(
+                hits=F('hits') + Case(*[When(pk=pk, then=Value(hits)) for pk, hits in totals.items()], default=Value(0))
+            )
+        # The owners' cached short url lists show the hits
+        for user_id in set(owners.values()):
+            bump_generation(user_id)
+
+
+# Per-process click counter. Resolutions only touch memory, the counts are
+# written in one batch every SHORTURL_CLICK_FLUSH_INTERVAL seconds (or once
+# SHORTURL_CLICK_MAX_PENDING keys are waiting) from a background thread.
+# Clicks still in memory when a worker is killed are lost.
+class ClickBuffer:
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._counts = Counter()
+        self._last_flush = time.monotonic()
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def record(self, short_url_id):
+        key = (short_url_id, bucket_for(timezone.now()))
+        with self._lock:
+            self._counts[key] += 1
+            due = (
+                len(self._counts) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if due and not self._flushing:
+                self._flushing = True
+                threading.Thread(target=self._flush_in_background, daemon=True).start()
+
+    def pending(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+        try:
+            write_clicks(counts)
+        except DatabaseError:
+            logger.exception('Could not write %d click counts', len(counts))
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._flushing = False
+            connection.close()
+
+
+click_buffer = ClickBuffer(settings.SHORTURL_CLICK_FLUSH_INTERVAL, settings.SHORTURL_CLICK_MAX_PENDING)
+atexit.register(click_buffer.flush)
@@ -0,0 +1,76 @@
+import os
+import string
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from shorturl.models import ShortCodeSequence
+
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_LENGTH = 7
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# The multiplier is coprime with CODE_SPACE (62 ** 7), so (n * MULTIPLIER + OFFSET) % CODE_SPACE
+# is a bijection: every sequence number maps to a different code and consecutive
+# numbers don't produce similar codes (the multiplier is close to CODE_SPACE / golden ratio).
+# Never change these once codes are issued.
+MULTIPLIER = 2176477521915
+OFFSET = 1013904223
+
+SEQUENCE_NAME = 'shorturl'
+
+
+def encode(number):
+    number = (number * MULTIPLIER + OFFSET) % CODE_SPACE
+    chars = []
+    for i in range(CODE_LENGTH):
+        number, remainder = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+# Reserve `size` numbers from the shared sequence, returns the range [start, end)
+def reserve_block(size):
+    with transaction.atomic():
+        # Update first so the row (or on SQLite the database) is write locked
+        # before reading the new value back
+        ShortCodeSequence.objects.filter(name=SEQUENCE_NAME).update(next_value=F('next_value') + size)
+        end = ShortCodeSequence.objects.values_list('next_value', flat=True).get(name=SEQUENCE_NAME)
+    return end - size, end
+
+
+# Hands out short codes from a block of sequence numbers reserved by this worker,
+# so creating a short url never has to check the database for collisions.
+# Only one query round trip per block is made.
+class ShortCodeAllocator:
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._pid = None
+
+    def allocate(self):
+        return self.allocate_many(1)[0]
+
+    # Codes for a whole batch, at most one block reservation per call
+    def allocate_many(self, count):
+        with self._lock:
+            # A forked worker must not keep using the block reserved by its parent
+            if self._pid != os.getpid():
+                self._next = self._end = 0
+                self._pid = os.getpid()
+            numbers = list(range(self._next, min(self._next + count, self._end)))
+            self._next += len(numbers)
+            missing = count - len(numbers)
+            if missing:
+                start, end = reserve_block(max(self.block_size, missing))
+                numbers.extend(range(start, start + missing))
+                self._next, self._end = start + missing, end
+        return [encode(number) for number in numbers]
+
+
+allocator = ShortCodeAllocator(settings.SHORTURL_CODE_BLOCK_SIZE)
@@ -0,0 +1,24 @@
+import hashlib
+
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'ftp': 21, 'ftps': 990}
+
+
+# Urls that only differ in scheme/host case, a default port or an empty path
+# point to the same place: HTTP://Example.com:80 -> http://example.com/
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username if parts.password is None else f'{parts.username}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, parts.fragment))
+
+
+def url_hash(url):
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
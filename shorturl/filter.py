@@ -0,0 +1,129 @@
+import threading
+import time
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from backend.bloom import CountingBloomFilter
+from shorturl.models import ShortUrl
+
+
+# Rows created this close to the snapshot may or may not be in it
+SNAPSHOT_MARGIN = timedelta(seconds=60)
+
+
+# Per-process filter over every issued short code. Codes it rules out are never
+# looked up in the database, a bot probing random codes costs a cache read.
+#
+# The filter is built in a background thread when the server starts (start(),
+# called from backend/wsgi.py and backend/asgi.py) or else the first time it's
+# needed, and rebuilt every SHORTURL_FILTER_REBUILD_INTERVAL seconds. Until it's
+# built every code "might exist". Codes created by other workers only show up
+# after the next rebuild, that's why a negative answer is still confirmed
+# against the shared cache (see shorturl/resolver.py).
+class ShortCodeFilter:
+    def __init__(self):
+        self._bloom = None
+        self._built_at = 0
+        self._snapshot_at = None
+        self._added = set()
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        capacity = max(ShortUrl.objects.count() * 2, settings.SHORTURL_FILTER_MIN_CAPACITY)
+        bloom = CountingBloomFilter(capacity, settings.SHORTURL_FILTER_ERROR_RATE)
+        for code in ShortUrl.objects.values_list('short_url', flat=True).iterator(chunk_size=10000):
+            bloom.add(code)
+        return bloom
+
+    def rebuild(self):
+        with self._lock:
+            if self._pending is None:
+                self._pending = []
+        snapshot_at = timezone.now()
+        try:
+            bloom = self.build()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            # Creates that happened while the table was being read. Deletes are not
+            # replayed, a code that may never have been added must not be removed.
+            for code in self._pending:
+                bloom.add(code)
+            self._bloom = bloom
+            self._built_at = time.monotonic()
+            self._snapshot_at = snapshot_at
+            self._added = set(self._pending)
+            self._pending = None
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            connection.close()
+
+    def _needs_rebuild(self):
+        if self._bloom is None:
+            return True
+        if len(self._bloom) > self._bloom.capacity:
+            return True
+        return time.monotonic() - self._built_at > settings.SHORTURL_FILTER_REBUILD_INTERVAL
+
+    # Starts a rebuild in the background if the filter is missing or stale,
+    # must be called with the lock held
+    def _start_rebuild(self):
+        if self._pending is None and self._needs_rebuild():
+            self._pending = []
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def start(self):
+        with self._lock:
+            self._start_rebuild()
+
+    def might_exist(self, code):
+        with self._lock:
+            self._start_rebuild()
+            bloom = self._bloom
+        return bloom is None or code in bloom
+
+    def add(self, code):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(code)
+            if self._bloom is not None:
+                self._bloom.add(code)
+                self._added.add(code)
+
+    def remove(self, short_url):
+        with self._lock:
+            if self._bloom is None:
+                return
+            code = short_url.short_url
+            created_at = short_url.created_at
+            # Only remove codes known to be in the filter, removing one that
+            # never was would clear counters that belong to other codes
+            if code in self._added:
+                self._added.discard(code)
+                self._bloom.remove(code)
+            elif created_at < self._snapshot_at - SNAPSHOT_MARGIN:
+                self._bloom.remove(code)
+
+    def stats(self):
+        bloom = self._bloom
+        if bloom is None:
+            return None
+        return {
+            'items': len(bloom),
+            'capacity': bloom.capacity,
+            'hash_count': bloom.hash_count,
+            'size_bytes': bloom.size_bytes,
+            'false_positive_rate': bloom.false_positive_rate(),
+        }
+
+
+short_code_filter = ShortCodeFilter()
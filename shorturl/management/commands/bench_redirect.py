@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from shorturl.models import ShortUrl
+from shorturl.views import generate_short_url
+
+
+# Compares requests per second of the async redirect view with the shortUrlDel GET.
+# Both go through Django's ASGI handler (in process, via the async test client),
+# resolve the same code through the same caches, and are timed the same way, so the
+# difference is the view stack: DRF + JWT auth in a worker thread vs. the async view.
+class Command(BaseCommand):
+    help = 'Benchmark the async short url redirect against the DRF shortUrlDel GET'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email='bench-redirect@example.com', first_name='Bench', last_name='Redirect'
+        )
+        try:
+            short_url = ShortUrl.objects.create(
+                original_url='https://example.com/', short_url=generate_short_url(), created_by=user
+            )
+            asyncio.run(self.run(user, short_url, options['requests']))
+        finally:
+            user.delete()
+
+    async def run(self, user, short_url, count):
+        client = AsyncClient()
+        client.cookies[settings.AUTH_COOKIE] = str(await sync_to_async(AccessToken.for_user)(user))
+
+        drf_rps = await self.bench(client, f'/api/shorturls/{short_url.short_url}/', 200, count)
+        redirect_rps = await self.bench(client, f'/s/{short_url.short_url}', 302, count)
+
+        self.stdout.write(f'shortUrlDel GET: {drf_rps:.0f} requests/s')
+        self.stdout.write(f'async redirect:  {redirect_rps:.0f} requests/s ({redirect_rps / drf_rps:.1f}x)')
+
+    async def bench(self, client, url, expected_status, count):
+        response = await client.get(url)
+        assert response.status_code == expected_status, response.status_code
+        start = time.perf_counter()
+        for i in range(count):
+            await client.get(url)
+        return count / (time.perf_counter() - start)
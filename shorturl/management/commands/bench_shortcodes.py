@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from shorturl.codes import allocator
+from shorturl.models import ShortUrl
+from shorturl.views import generate_short_url
+
+
+class Rollback(Exception):
+    pass
+
+
+# Fills the table with --rows short urls and then measures --creates creates on top of it.
+# Everything runs in one transaction that is rolled back at the end.
+class Command(BaseCommand):
+    help = 'Benchmark short code allocation against a large short url table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--creates', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        user = get_user_model().objects.create_user(
+            email='bench-shortcodes@example.com', first_name='Bench', last_name='Shortcodes'
+        )
+
+        start = time.perf_counter()
+        remaining = options['rows']
+        while remaining > 0:
+            size = min(options['batch_size'], remaining)
+            ShortUrl.objects.bulk_create(
+                ShortUrl(original_url='https://example.com/', short_url=allocator.allocate(), created_by=user)
+                for i in range(size)
+            )
+            remaining -= size
+        self.stdout.write(f"Filled {options['rows']} rows in {time.perf_counter() - start:.1f}s")
+
+        lengths = set()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(options['creates']):
+                short_url = ShortUrl.objects.create(
+                    original_url='https://example.com/', short_url=generate_short_url(), created_by=user
+                )
+                lengths.add(len(short_url.short_url))
+        elapsed = time.perf_counter() - start
+
+        creates = options['creates']
+        self.stdout.write(f'Creates: {creates} in {elapsed:.3f}s ({elapsed / creates * 1000:.3f} ms each)')
+        self.stdout.write(f'Queries: {len(queries)} ({len(queries) / creates:.3f} per create)')
+        self.stdout.write(f'Code lengths: {sorted(lengths)}')
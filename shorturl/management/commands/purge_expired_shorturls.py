@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shorturl.models import ShortUrl
+from shorturl.resolver import resolver
+
+
+# Deletes short urls whose expires_at has passed, --chunk-size rows at a time.
+# Each chunk is found through the expires_at index and deleted in its own short
+# transaction, so the purge never holds long locks. Run it periodically (cron).
+class Command(BaseCommand):
+    help = 'Delete expired short urls in bounded chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to wait between chunks')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            rows = list(
+                ShortUrl.objects.filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'short_url')[:options['chunk_size']]
+            )
+            if not rows:
+                break
+            ShortUrl.objects.filter(pk__in=[pk for pk, code in rows]).delete()
+            for pk, code in rows:
+                resolver.invalidate(code)
+            deleted += len(rows)
+            time.sleep(options['sleep'])
+        self.stdout.write(f'Deleted {deleted} expired short urls')
@@ -0,0 +1,39 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from shorturl.codes import CODE_LENGTH
+from shorturl.filter import ShortCodeFilter
+
+
+# Builds the short code existence filter from the table and reports its size and
+# false positive rate. The measured rate probes random codes one character longer
+# than issued codes, none of which can exist (legacy codes are multiples of 6 long).
+class Command(BaseCommand):
+    help = 'Report size and false positive rate of the short code existence filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--probes', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        short_code_filter = ShortCodeFilter()
+        start = time.perf_counter()
+        short_code_filter.rebuild()
+        build_time = time.perf_counter() - start
+        stats = short_code_filter.stats()
+
+        self.stdout.write(f"Items: {stats['items']} (capacity {stats['capacity']})")
+        self.stdout.write(f"Size: {stats['size_bytes'] / 1024 / 1024:.2f} MiB, {stats['hash_count']} hashes")
+        self.stdout.write(f'Build time: {build_time:.2f}s')
+        self.stdout.write(f"Expected false positive rate: {stats['false_positive_rate']:.5f}")
+
+        probes = options['probes']
+        alphabet = string.digits + string.ascii_letters
+        codes = [''.join(random.choices(alphabet, k=CODE_LENGTH + 1)) for i in range(probes)]
+        start = time.perf_counter()
+        false_positives = sum(short_code_filter.might_exist(code) for code in codes)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Measured false positive rate: {false_positives / probes:.5f} over {probes} probes')
+        self.stdout.write(f'Check time: {elapsed / probes * 1000000:.2f} us per code')
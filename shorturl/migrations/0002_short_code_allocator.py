@@ -0,0 +1,40 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    ShortCodeSequence = apps.get_model("shorturl", "ShortCodeSequence")
+    ShortCodeSequence.objects.get_or_create(name="shorturl")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShortCodeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("next_value", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="shorturl",
+            name="short_url",
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
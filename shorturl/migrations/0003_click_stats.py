@@ -0,0 +1,49 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0002_short_code_allocator"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shorturl",
+            name="hits",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="ShortUrlClicks",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("hits", models.PositiveBigIntegerField(default=0)),
+                (
+                    "short_url",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="clicks",
+                        to="shorturl.shorturl",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="shorturlclicks",
+            constraint=models.UniqueConstraint(
+                fields=("short_url", "bucket"), name="shorturl_clicks_bucket_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:38
+
+import hashlib
+
+from urllib.parse import urlsplit, urlunsplit
+
+from django.db import migrations, models
+
+# Copied from shorturl/dedup.py as it was when this migration was written, so
+# later changes there don't change what this migration does
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21, "ftps": 990}
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username:
+        userinfo = (
+            parts.username
+            if parts.password is None
+            else f"{parts.username}:{parts.password}"
+        )
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+
+def url_hash(url):
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+
+def backfill_hashes(apps, schema_editor):
+    ShortUrl = apps.get_model("shorturl", "ShortUrl")
+    batch = []
+    for short_url in ShortUrl.objects.only("id", "original_url").iterator(
+        chunk_size=2000
+    ):
+        short_url.original_url_hash = url_hash(short_url.original_url)
+        batch.append(short_url)
+        if len(batch) == 2000:
+            ShortUrl.objects.bulk_update(batch, ["original_url_hash"])
+            batch = []
+    ShortUrl.objects.bulk_update(batch, ["original_url_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0003_click_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shorturl",
+            name="original_url_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="shorturl",
+            index=models.Index(
+                fields=["created_by", "original_url_hash"],
+                name="shorturl_owner_url_hash_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_hashes, migrations.RunPython.noop),
+    ]
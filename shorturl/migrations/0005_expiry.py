@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0004_original_url_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shorturl",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="shorturl",
+            name="max_hits",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0005_expiry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="shorturl",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="shorturl_owner_created_idx",
+            ),
+        ),
+    ]
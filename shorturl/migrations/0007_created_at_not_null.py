@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:31
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+# Pagination orders and continues by created_at, rows saved before it was set
+# get one before the column becomes NOT NULL
+def backfill_created_at(apps, schema_editor):
+    ShortUrl = apps.get_model("shorturl", "ShortUrl")
+    ShortUrl.objects.filter(created_at__isnull=True).update(created_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shorturl", "0006_owner_created_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="shorturl",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
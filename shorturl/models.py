@@ -1,12 +1,54 @@
 from django.db import models
 from django.conf import settings
 
+from shorturl.dedup import url_hash
+
 
 class ShortUrl(models.Model):
     original_url = models.URLField(max_length=600)
-    short_url = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    short_url = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    hits = models.PositiveBigIntegerField(default=0)
+    # sha256 of the normalized original url, used to find a user's existing short url
+    original_url_hash = models.CharField(max_length=64, null=True, blank=True)
+    # Optional limits, the short url stops resolving once either is reached
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    max_hits = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at', 'id'], name='shorturl_owner_created_idx'),
+            models.Index(fields=['created_by', 'original_url_hash'], name='shorturl_owner_url_hash_idx'),
+        ]
+
+    def __str__(self):
+        return self.original_url
+
+    def save(self, *args, **kwargs):
+        self.original_url_hash = url_hash(self.original_url)
+        super().save(*args, **kwargs)
+
+
+# Hourly click counts per short url, written in batches by shorturl/clicks.py
+class ShortUrlClicks(models.Model):
+    short_url = models.ForeignKey(ShortUrl, on_delete=models.CASCADE, related_name='clicks')
+    bucket = models.DateTimeField()
+    hits = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['short_url', 'bucket'], name='shorturl_clicks_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.short_url_id} {self.bucket}: {self.hits}'
+
+
+# Shared counter that hands out blocks of ids to the short code allocator
+class ShortCodeSequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
-        return self.original_url
\ No newline at end of file
+        return f'{self.name}: {self.next_value}'
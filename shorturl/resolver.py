@@ -0,0 +1,161 @@
+import threading
+import time
+
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from shorturl.models import ShortUrl
+
+
+# Defaults keep entries cached before expiry fields were added readable
+Resolution = namedtuple('Resolution', ['id', 'original_url', 'expires_at', 'max_hits'], defaults=(None, None))
+RESOLUTION_FIELDS = ('id', 'original_url', 'expires_at', 'max_hits')
+
+# Stored for codes that don't exist, so repeated misses don't reach the database
+MISSING = 'missing'
+
+
+# How long new short urls stay in the shared cache: every worker's filter is
+# rebuilt within SHORTURL_FILTER_REBUILD_INTERVAL (plus the time the rebuild
+# takes), after that the filter has them. A new code evicted from the cache
+# before then doesn't resolve in workers whose filter doesn't have it yet.
+def created_timeout():
+    return max(settings.SHORTURL_CACHE_TIMEOUT, 2 * settings.SHORTURL_FILTER_REBUILD_INTERVAL)
+
+
+# Small thread safe LRU kept in each worker process.
+# Entries expire after `timeout` seconds so deletes made by other workers
+# (which only reach the shared cache) are picked up quickly.
+class LocalLRU:
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Resolves short codes through the local LRU, then the shared Django cache,
+# and only then the database
+class ShortUrlResolver:
+    def __init__(self):
+        self.local = LocalLRU(settings.SHORTURL_LOCAL_CACHE_SIZE, settings.SHORTURL_LOCAL_CACHE_TIMEOUT)
+
+    def cache_key(self, code):
+        return f'shorturl:resolve:{code}'
+
+    # Codes the existence filter has ruled out (might_exist=False) are never
+    # read from the database, they are only looked up in the shared cache. The
+    # filter only has the codes created by other workers after its next rebuild,
+    # until then they are found through the entry written when they were created
+    # (see created_timeout). A miss isn't cached.
+    def resolve(self, code, might_exist=True):
+        value = self.local.get(code)
+        if value is None:
+            value = cache.get(self.cache_key(code))
+            if value is None:
+                if not might_exist:
+                    return None
+                value = self.load(code)
+            self.local.set(code, value)
+        return None if value == MISSING else value
+
+    async def aresolve(self, code, might_exist=True):
+        value = self.local.get(code)
+        if value is None:
+            value = await cache.aget(self.cache_key(code))
+            if value is None:
+                if not might_exist:
+                    return None
+                value = await self.aload(code)
+            self.local.set(code, value)
+        return None if value == MISSING else value
+
+    def load(self, code):
+        row = ShortUrl.objects.filter(short_url=code).values_list(*RESOLUTION_FIELDS).first()
+        if row is None:
+            cache.set(self.cache_key(code), MISSING, settings.SHORTURL_NEGATIVE_CACHE_TIMEOUT)
+            return MISSING
+        value = Resolution(*row)
+        cache.set(self.cache_key(code), value, settings.SHORTURL_CACHE_TIMEOUT)
+        return value
+
+    async def aload(self, code):
+        row = await ShortUrl.objects.filter(short_url=code).values_list(*RESOLUTION_FIELDS).afirst()
+        if row is None:
+            await cache.aset(self.cache_key(code), MISSING, settings.SHORTURL_NEGATIVE_CACHE_TIMEOUT)
+            return MISSING
+        value = Resolution(*row)
+        await cache.aset(self.cache_key(code), value, settings.SHORTURL_CACHE_TIMEOUT)
+        return value
+
+    def resolution_for(self, short_url):
+        return Resolution(*(getattr(short_url, field) for field in RESOLUTION_FIELDS))
+
+    # Checks the expiry and hit limits of a resolved short url. A hit on a short
+    # url with max_hits is counted in the database right away, by an UPDATE that
+    # only matches while hits < max_hits, so concurrent requests on any worker
+    # can't go over the limit. Those short urls cost one write per hit, their
+    # clicks are left out of the batched totals (see shorturl/clicks.py).
+    def check_limits(self, resolution):
+        if resolution.expires_at is not None and resolution.expires_at <= timezone.now():
+            return False
+        if resolution.max_hits is None:
+            return True
+        return ShortUrl.objects.filter(pk=resolution.id, hits__lt=F('max_hits')).update(hits=F('hits') + 1) == 1
+
+    async def acheck_limits(self, resolution):
+        if resolution.expires_at is not None and resolution.expires_at <= timezone.now():
+            return False
+        if resolution.max_hits is None:
+            return True
+        return await ShortUrl.objects.filter(pk=resolution.id, hits__lt=F('max_hits')).aupdate(hits=F('hits') + 1) == 1
+
+    # Called after a short url is created, replaces a cached miss for the code
+    def remember(self, short_url):
+        value = self.resolution_for(short_url)
+        cache.set(self.cache_key(short_url.short_url), value, created_timeout())
+        self.local.set(short_url.short_url, value)
+
+    def remember_many(self, short_urls):
+        values = {short_url.short_url: self.resolution_for(short_url) for short_url in short_urls}
+        cache.set_many({self.cache_key(code): value for code, value in values.items()}, created_timeout())
+        for code, value in values.items():
+            self.local.set(code, value)
+
+    # Called after a short url is deleted
+    def invalidate(self, code):
+        cache.set(self.cache_key(code), MISSING, settings.SHORTURL_NEGATIVE_CACHE_TIMEOUT)
+        self.local.delete(code)
+
+
+resolver = ShortUrlResolver()
@@ -1,8 +1,19 @@
 from rest_framework.serializers import ModelSerializer
-from shorturl.models import ShortUrl
+from backend.serializers import ValuesSerializer
+from shorturl.models import ShortUrl, ShortUrlClicks
 
 
 class ShortUrlSerializer(ModelSerializer):
   class Meta:
     model = ShortUrl
-    fields = "__all__"
\ No newline at end of file
+    exclude = ['original_url_hash']
+
+
+# Same output for lists, without model instances
+short_url_values = ValuesSerializer(ShortUrlSerializer)
+
+
+class ShortUrlClicksSerializer(ModelSerializer):
+  class Meta:
+    model = ShortUrlClicks
+    fields = ['bucket', 'hits']
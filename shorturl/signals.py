@@ -0,0 +1,25 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.responsecache import bump_generation
+from shorturl.filter import short_code_filter
+from shorturl.models import ShortUrl
+from shorturl.resolver import resolver
+
+
+@receiver(post_save, sender=ShortUrl)
+def add_to_filter(sender, instance, created, **kwargs):
+    if created:
+        short_code_filter.add(instance.short_url)
+    bump_generation(instance.created_by_id)
+
+
+# Every delete (the view, the purge command, a user's cascade, the admin)
+# replaces the cached resolution with a miss once it's committed
+@receiver(post_delete, sender=ShortUrl)
+def remove_from_filter(sender, instance, using, **kwargs):
+    short_code_filter.remove(instance)
+    transaction.on_commit(partial(resolver.invalidate, instance.short_url), using=using)
+    bump_generation(instance.created_by_id)
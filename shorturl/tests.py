@@ -1,3 +1,380 @@
+import io
+import threading
+import time
+
+from unittest import mock
+
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.bloom import CountingBloomFilter
+from backend.ratelimit import SlidingWindowLimiter, TokenBucketLimiter, parse_rate
+from shorturl.clicks import ClickBuffer
+from shorturl.dedup import normalize_url
+from shorturl.codes import CODE_LENGTH, ShortCodeAllocator, encode, reserve_block
+from shorturl.filter import ShortCodeFilter, short_code_filter
+from shorturl.models import ShortUrl, ShortUrlClicks
+from shorturl.resolver import resolver
+from shorturl.serializers import ShortUrlSerializer, short_url_values
+
+
+class ShortCodeAllocatorTests(TestCase):
+    def test_codes_are_unique_and_fixed_length(self):
+        allocator = ShortCodeAllocator(block_size=100)
+        codes = [allocator.allocate() for i in range(1000)]
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertEqual({len(code) for code in codes}, {CODE_LENGTH})
+
+    def test_reserved_blocks_do_not_overlap(self):
+        first = reserve_block(10)
+        second = reserve_block(10)
+        self.assertEqual(first[1] - first[0], 10)
+        self.assertGreaterEqual(second[0], first[1])
+
+    def test_allocate_many_spans_blocks(self):
+        allocator = ShortCodeAllocator(block_size=10)
+        codes = [allocator.allocate() for i in range(5)] + allocator.allocate_many(30)
+        self.assertEqual(len(set(codes)), 35)
+
+    def test_large_sequence_numbers_keep_code_length(self):
+        self.assertEqual(len(encode(10 ** 12)), CODE_LENGTH)
+
+    def test_no_queries_inside_a_block(self):
+        allocator = ShortCodeAllocator(block_size=50)
+        allocator.allocate()
+        with self.assertNumQueries(0):
+            for i in range(49):
+                allocator.allocate()
+
+
+class ShortUrlResolverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        resolver.local.clear()
+        self.user = get_user_model().objects.create_user(email='resolver@example.com', first_name='A', last_name='B')
+        self.short_url = ShortUrl.objects.create(
+            original_url='https://example.com/', short_url='abcdefg', created_by=self.user
+        )
+        # Build the shared filter here so the views don't start a background rebuild
+        short_code_filter.rebuild()
+
+    def test_repeated_resolutions_skip_the_database(self):
+        with self.assertNumQueries(1):
+            for i in range(100):
+                resolution = resolver.resolve('abcdefg')
+        self.assertEqual(resolution.original_url, 'https://example.com/')
+
+    def test_shared_cache_is_used_when_local_entry_is_gone(self):
+        resolver.resolve('abcdefg')
+        resolver.local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('abcdefg').id, self.short_url.id)
+
+    def test_unknown_codes_are_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolver.resolve('missing'))
+            self.assertIsNone(resolver.resolve('missing'))
+
+    async def test_redirect_view(self):
+        response = await self.async_client.get('/s/abcdefg')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://example.com/')
+        response = await self.async_client.get('/s/missing')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_codes_are_rejected_without_queries(self):
+        self.assertFalse(short_code_filter.might_exist('zzzzzzz'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/s/zzzzzzz')
+        self.assertEqual(response.status_code, 404)
+
+    def test_code_created_by_another_worker_resolves(self):
+        # Not in this process' filter (no post_save here), only in the shared
+        # cache the other worker wrote to when it created the code
+        short_urls = ShortUrl.objects.bulk_create([
+            ShortUrl(original_url='https://example.org/', short_url='hijklmn', created_by=self.user)
+        ])
+        resolver.remember_many(short_urls)
+        resolver.local.clear()
+        self.assertFalse(short_code_filter.might_exist('hijklmn'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/s/hijklmn')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://example.org/')
+
+    def test_invalidate_after_delete(self):
+        resolver.resolve('abcdefg')
+        self.short_url.delete()
+        resolver.invalidate('abcdefg')
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolver.resolve('abcdefg'))
+
+    def test_every_delete_invalidates_on_commit(self):
+        resolver.resolve('abcdefg')
+        with self.captureOnCommitCallbacks(execute=True):
+            # Like the purge command or a user's cascade, not the DELETE view
+            ShortUrl.objects.filter(short_url='abcdefg').delete()
+            self.assertIsNotNone(cache.get(resolver.cache_key('abcdefg')))
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolver.resolve('abcdefg'))
+
+
+class ShortCodeFilterTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='filter@example.com', first_name='A', last_name='B')
+        self.short_url = ShortUrl.objects.create(
+            original_url='https://example.com/', short_url='abcdefg', created_by=self.user
+        )
+        self.filter = ShortCodeFilter()
+        self.filter.rebuild()
+
+    def test_bloom_filter_add_and_remove(self):
+        bloom = CountingBloomFilter(capacity=1000)
+        bloom.add('abc')
+        self.assertIn('abc', bloom)
+        self.assertTrue(bloom.remove('abc'))
+        self.assertNotIn('abc', bloom)
+
+    def test_issued_codes_might_exist(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.filter.might_exist('abcdefg'))
+            self.assertFalse(self.filter.might_exist('zzzzzzz'))
+
+    def test_created_and_deleted_codes_are_tracked(self):
+        other = ShortUrl.objects.create(original_url='https://example.com/', short_url='hijklmn', created_by=self.user)
+        self.filter.add(other.short_url)
+        self.assertTrue(self.filter.might_exist('hijklmn'))
+        self.filter.remove(other)
+        self.assertFalse(self.filter.might_exist('hijklmn'))
+
+    def test_codes_from_other_workers_are_not_removed(self):
+        other = ShortUrl.objects.create(original_url='https://example.com/', short_url='hijklmn', created_by=self.user)
+        self.filter.remove(other)
+        self.assertTrue(self.filter.might_exist('abcdefg'))
+
+
+class ClickBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        resolver.local.clear()
+        self.user = get_user_model().objects.create_user(email='clicks@example.com', first_name='A', last_name='B')
+        self.short_urls = [
+            ShortUrl.objects.create(original_url='https://example.com/', short_url=code, created_by=self.user)
+            for code in ('aaaaaaa', 'bbbbbbb')
+        ]
+        self.buffer = ClickBuffer(flush_interval=3600, max_pending=100000)
+
+    def test_resolutions_are_flushed_in_a_few_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(10000):
+                resolution = resolver.resolve(self.short_urls[i % 2].short_url)
+                self.buffer.record(resolution.id)
+            self.buffer.flush()
+        writes = [q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertLessEqual(len(writes), 3)
+
+        for short_url in self.short_urls:
+            short_url.refresh_from_db()
+            self.assertEqual(short_url.hits, 5000)
+            self.assertEqual(ShortUrlClicks.objects.get(short_url=short_url).hits, 5000)
+
+    def test_flushes_add_up(self):
+        for i in range(2):
+            self.buffer.record(self.short_urls[0].id)
+            self.buffer.flush()
+        self.assertEqual(ShortUrlClicks.objects.get(short_url=self.short_urls[0]).hits, 2)
+
+    def test_clicks_for_deleted_short_urls_are_dropped(self):
+        self.buffer.record(self.short_urls[0].id)
+        self.short_urls[0].delete()
+        self.buffer.flush()
+        self.assertFalse(ShortUrlClicks.objects.exists())
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def hit_in_parallel(self, limiter, threads=20, hits=10):
+        allowed = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            for i in range(hits):
+                allowed.append(limiter.hit('test'))
+
+        workers = [threading.Thread(target=worker) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return allowed.count(True)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('2/100s'), (2, 100))
+        with self.assertRaises(ValueError):
+            parse_rate('10 per minute')
+
+    def test_sliding_window_limit_holds_under_parallel_load(self):
+        limiter = SlidingWindowLimiter(limit=50, window=10 ** 9)
+        self.assertEqual(self.hit_in_parallel(limiter), 50)
+
+    def test_token_bucket_limit_holds_under_parallel_load(self):
+        limiter = TokenBucketLimiter(capacity=50, rate=10 ** -6)
+        self.assertEqual(self.hit_in_parallel(limiter), 50)
+
+    def test_rejected_requests_do_not_use_up_the_limit(self):
+        limiter = SlidingWindowLimiter(limit=1, window=10 ** 9)
+        self.assertTrue(limiter.hit('test'))
+        self.assertFalse(limiter.hit('test'))
+        self.assertEqual(cache.get(f'test:{int(time.time() // 10 ** 9)}'), 1)
+
+
+class ShortUrlBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='bulk@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, original_urls):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/shorturls/bulk/', {'original_urls': original_urls}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(queries)
+
+    def test_results_per_url(self):
+        results, queries = self.post(['https://example.com/a', 'not a url', 'https://example.com/b'])
+        self.assertEqual(results[0]['original_url'], 'https://example.com/a')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['original_url'], 'https://example.com/b')
+        self.assertEqual(ShortUrl.objects.filter(created_by=self.user).count(), 2)
+
+    def test_dedup_reuses_existing_and_repeated_urls(self):
+        first, queries = self.post(['https://example.com/a'])
+        results = self.client.post(
+            '/api/shorturls/bulk/',
+            {'original_urls': ['HTTPS://EXAMPLE.com:443/a', 'https://example.com/b', 'https://example.com/b'], 'dedup': True},
+            format='json',
+        ).data['results']
+        self.assertEqual(results[0]['short_url'], first[0]['short_url'])
+        self.assertEqual(results[1]['short_url'], results[2]['short_url'])
+        self.assertEqual(ShortUrl.objects.filter(created_by=self.user).count(), 2)
+
+    # A fresh allocator, so the only block reservation happens in the small batch
+    @mock.patch('shorturl.views.allocator', ShortCodeAllocator(block_size=10000))
+    def test_query_count_does_not_depend_on_batch_size(self):
+        small_results, small_queries = self.post([f'https://example.com/{i}' for i in range(5)])
+        large_results, large_queries = self.post([f'https://example.com/{i}' for i in range(500)])
+        self.assertEqual(len({result['short_url'] for result in small_results + large_results}), 505)
+        self.assertLessEqual(large_queries, small_queries)
+
+    def test_bulk_create_invalidates_cached_list(self):
+        self.assertEqual(self.client.get('/api/shorturls/').json(), [])
+        self.post(['https://example.com/a'])
+        self.assertEqual(len(self.client.get('/api/shorturls/').json()), 1)
+
+
+class ShortUrlDedupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='dedup@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url('HTTP://Example.com:80'), 'http://example.com/')
+        self.assertEqual(normalize_url('https://example.com:8443/a?b=1'), 'https://example.com:8443/a?b=1')
+
+    def test_dedup_returns_existing_short_url(self):
+        first = self.client.post('/api/shorturls/', {'original_url': 'https://example.com/a'}, format='json').data
+        with self.assertNumQueries(1):
+            second = self.client.post(
+                '/api/shorturls/', {'original_url': 'https://example.com/a', 'dedup': True}, format='json'
+            ).data
+        self.assertEqual(first['short_url'], second['short_url'])
+        self.assertEqual(ShortUrl.objects.count(), 1)
+
+
+class ShortUrlValuesSerializerTests(TestCase):
+    def test_same_fields_as_serializer(self):
+        user = get_user_model().objects.create_user(email='values@example.com', first_name='A', last_name='B')
+        ShortUrl.objects.create(original_url='https://example.com/a', short_url='aaaaaaa', created_by=user)
+        ShortUrl.objects.create(
+            original_url='https://example.com/b', short_url='bbbbbbb', created_by=user,
+            expires_at=timezone.now() + timedelta(days=1), max_hits=10, hits=3,
+        )
+        short_urls = ShortUrl.objects.order_by('id')
+        for zone in ['UTC', 'Europe/Skopje']:
+            with timezone.override(zone):
+                rows = short_url_values.serialize(short_url_values.queryset(short_urls))
+                expected = ShortUrlSerializer(short_urls, many=True).data
+                # Field by field, in the same order
+                self.assertEqual([list(row.items()) for row in rows], [list(row.items()) for row in expected])
+                self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+
+class ShortUrlExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        resolver.local.clear()
+        self.user = get_user_model().objects.create_user(email='expiry@example.com', first_name='A', last_name='B')
+
+    def create(self, code, **kwargs):
+        return ShortUrl.objects.create(original_url='https://example.com/', short_url=code, created_by=self.user, **kwargs)
+
+    def test_expired_short_urls_do_not_resolve(self):
+        self.create('expired', expires_at=timezone.now() - timedelta(seconds=1))
+        self.create('current', expires_at=timezone.now() + timedelta(days=1))
+        self.assertFalse(resolver.check_limits(resolver.resolve('expired')))
+        self.assertTrue(resolver.check_limits(resolver.resolve('current')))
+
+    def test_max_hits(self):
+        self.create('limited', max_hits=2)
+        self.assertEqual(
+            [resolver.check_limits(resolver.resolve('limited')) for i in range(3)], [True, True, False]
+        )
+
+    def test_max_hits_holds_across_workers_and_is_counted_once(self):
+        short_url = self.create('limited', max_hits=3)
+        # Another worker already used two hits, nothing cached here knows it
+        ShortUrl.objects.filter(pk=short_url.pk).update(hits=2)
+        self.assertEqual(
+            [resolver.check_limits(resolver.resolve('limited')) for i in range(2)], [True, False]
+        )
+        buffer = ClickBuffer(flush_interval=3600, max_pending=100000)
+        buffer.record(short_url.id)
+        buffer.flush()
+        short_url.refresh_from_db()
+        self.assertEqual(short_url.hits, 3)
+        self.assertEqual(ShortUrlClicks.objects.get(short_url=short_url).hits, 1)
+
+    def test_max_hits_below_one_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for max_hits in [0, -1, '0', 'many']:
+            # Creation is rate limited
+            cache.clear()
+            response = client.post(
+                '/api/shorturls/', {'original_url': 'https://example.com/', 'max_hits': max_hits}, format='json'
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(ShortUrl.objects.exists())
 
-# Create your tests here.
+    def test_purge_deletes_expired_short_urls_in_chunks(self):
+        for i in range(5):
+            self.create(f'expired{i}', expires_at=timezone.now() - timedelta(seconds=1))
+        self.create('current', expires_at=timezone.now() + timedelta(days=1))
+        self.create('forever')
+        call_command('purge_expired_shorturls', chunk_size=2, sleep=0, stdout=io.StringIO())
+        self.assertEqual(set(ShortUrl.objects.values_list('short_url', flat=True)), {'current', 'forever'})
@@ -1,8 +1,10 @@
 from django.urls import path, re_path
-from shorturl.views import shortUrl, shortUrlDel
+from shorturl.views import shortUrl, shortUrlBulk, shortUrlDel, shortUrlStats
 
 
 urlpatterns=[
     path('', shortUrl, name='shorturls'),
+    path('bulk/', shortUrlBulk, name='shorturls-bulk'),
+    path('<int:id>/stats/', shortUrlStats),
     path('<str:id>/', shortUrlDel),
 ]
\ No newline at end of file
@@ -1,15 +1,25 @@
-import string
-import random
 import re
 
-from functools import wraps
-from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponseNotAllowed, HttpResponseRedirect
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from shorturl.serializers import ShortUrlSerializer
+from backend.pagination import KeysetPagination
+from backend.ratelimit import ratelimit
+from backend.responsecache import bump_generation, cached_response
+from backend.serializers import sparse_fields
+from shorturl.serializers import ShortUrlSerializer, ShortUrlClicksSerializer, short_url_values
 from shorturl.models import ShortUrl
+from shorturl.clicks import click_buffer
+from shorturl.codes import allocator
+from shorturl.dedup import url_hash
+from shorturl.filter import short_code_filter
+from shorturl.resolver import resolver
 
 # URL validation regex
 regex = re.compile(
@@ -22,60 +32,173 @@ regex = re.compile(
 
 
 # Generate short url
+# Codes come from per-worker blocks of a shared sequence, so they are unique
+# without querying the table and always CODE_LENGTH characters long
 def generate_short_url():
-    chars = list(string.ascii_letters)
-    random_chars = ''
-    for i in range(6):
-        random_chars += random.choice(chars)
-    while len(ShortUrl.objects.filter(short_url=random_chars)) != 0:
-        for i in range(6):
-            random_chars += random.choice(chars)
-    return random_chars
-
-
-# Rate Limit for Short urls
-# Used just in case user posting/creating short urls to prevent malicious attacks/brute force
-def ratelimit_post(rate_limit, time_window):
-    def decorator(view_func): # View func refers to the function we want to wrap in this case (shortUrl)
-        @wraps(view_func)
-        def wrapped_view(request, *args, **kwargs):
-            if request.method == 'POST':
-                ip_address = request.META.get('REMOTE_ADDR')
-                cache_key = f'ratelimit:{ip_address}'
-                request_count = cache.get(cache_key, 0)
-                if request_count >= rate_limit:
-                    return Response({'error': 'Rate limit exceeded'}, status=429)
-                cache.set(cache_key, request_count + 1, time_window)
-            return view_func(request, *args, **kwargs)
-        return wrapped_view
-    return decorator
+    return allocator.allocate()
+
+
+# Dedup mode returns the user's existing short url for an original url instead of
+# creating a new one. Off by default (SHORTURL_DEDUP), a request can set "dedup".
+def wants_dedup(request):
+    dedup = request.data.get('dedup', settings.SHORTURL_DEDUP)
+    if isinstance(dedup, str):
+        return dedup.lower() in ('true', '1')
+    return bool(dedup)
+
+
+# Optional expires_at (ISO 8601) and max_hits of a new short url,
+# returns (expires_at, max_hits, error)
+def parse_limits(data):
+    expires_at = data.get('expires_at') or None
+    # 0 is rejected below, not taken as "no limit"
+    max_hits = data.get('max_hits')
+    if max_hits == '':
+        max_hits = None
+    if expires_at is not None:
+        expires_at = parse_datetime(expires_at) if isinstance(expires_at, str) else None
+        if expires_at is None:
+            return None, None, 'expires_at should be an ISO 8601 datetime'
+        if timezone.is_naive(expires_at):
+            expires_at = timezone.make_aware(expires_at)
+        if expires_at <= timezone.now():
+            return None, None, 'expires_at should be in the future'
+    if max_hits is not None:
+        try:
+            max_hits = int(max_hits)
+        except (TypeError, ValueError):
+            return None, None, 'max_hits should be a positive number'
+        if max_hits <= 0:
+            return None, None, 'max_hits should be a positive number'
+    return expires_at, max_hits, None
+
 
 # Short url endpoints
-@ratelimit_post(rate_limit=2, time_window=100)
+# Creates are rate limited to prevent malicious attacks/brute force
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@ratelimit('2/100s', key='ip')
+@cached_response
 def shortUrl(request):
     if request.method == 'GET':
         user = request.user
         shortened_urls = user.shorturl_set.all()
-        serializer = ShortUrlSerializer(shortened_urls, many=True)
-        return Response(serializer.data)
+        values = sparse_fields(short_url_values, request)
+        # Paginated when the client asks for it with ?page_size= or ?cursor=,
+        # the pagination key is read even when it isn't one of the fields
+        rows = values.queryset(shortened_urls, 'created_at', 'id')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(rows, request)
+        if page is not None:
+            return paginator.get_paginated_response(values.serialize(page))
+        return Response(values.serialize(rows))
     
 
     if request.method == "POST":
-        short_url = generate_short_url()
         original_url = request.data['original_url']
         match = re.match(regex, original_url) is not None
         if not match:
             return Response({'error':"Url not valid, url example: http://www...."}, status=status.HTTP_400_BAD_REQUEST)
+        expires_at, max_hits, error = parse_limits(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        # Short urls with limits are never shared
+        if wants_dedup(request) and expires_at is None and max_hits is None:
+            existing = ShortUrl.objects.filter(
+                created_by=request.user, original_url_hash=url_hash(original_url),
+                expires_at__isnull=True, max_hits__isnull=True,
+            ).order_by('id').first()
+            if existing is not None:
+                serializer = ShortUrlSerializer(existing, many=False)
+                return Response(serializer.data)
+        short_url = generate_short_url()
         shortened_url = ShortUrl.objects.create(
             original_url = original_url,
             short_url = short_url,
-            created_by = request.user
+            created_by = request.user,
+            expires_at = expires_at,
+            max_hits = max_hits
         )
+        resolver.remember(shortened_url)
         serializer = ShortUrlSerializer(shortened_url, many=False)
         return Response(serializer.data)
 
+# Bulk create, takes {"original_urls": [...]} and returns a result per url in the same
+# order, either the created short url or an error. Valid urls are inserted in one
+# transaction, the number of queries doesn't depend on the number of urls.
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@ratelimit('10/m', key='user')
+def shortUrlBulk(request):
+    original_urls = request.data.get('original_urls')
+    if not isinstance(original_urls, list) or not original_urls:
+        return Response({'error': 'original_urls should be a non empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(original_urls) > settings.SHORTURL_BULK_MAX_SIZE:
+        return Response({'error': f'At most {settings.SHORTURL_BULK_MAX_SIZE} urls per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # expires_at and max_hits apply to every url of the request
+    expires_at, max_hits, error = parse_limits(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    valid = []
+    for index, original_url in enumerate(original_urls):
+        if isinstance(original_url, str) and re.match(regex, original_url) is not None:
+            valid.append(index)
+            results.append(None)
+        else:
+            results.append({'original_url': original_url, 'error': "Url not valid, url example: http://www...."})
+
+    # Indexes of the valid urls grouped by hash, only the first of each group
+    # is created when deduplicating
+    groups = {}
+    for index in valid:
+        groups.setdefault(url_hash(original_urls[index]), []).append(index)
+
+    if wants_dedup(request) and expires_at is None and max_hits is None:
+        existing = ShortUrl.objects.filter(
+            created_by=request.user, original_url_hash__in=list(groups),
+            expires_at__isnull=True, max_hits__isnull=True,
+        ).order_by('-id')
+        for short_url in existing:
+            for index in groups[short_url.original_url_hash]:
+                results[index] = ShortUrlSerializer(short_url).data
+        to_create = [indexes[0] for hash, indexes in groups.items() if results[indexes[0]] is None]
+    else:
+        to_create = valid
+
+    if to_create:
+        codes = allocator.allocate_many(len(to_create))
+        with transaction.atomic():
+            shortened_urls = ShortUrl.objects.bulk_create([
+                ShortUrl(
+                    original_url=original_urls[index],
+                    original_url_hash=url_hash(original_urls[index]),
+                    short_url=code,
+                    created_by=request.user,
+                    expires_at=expires_at,
+                    max_hits=max_hits,
+                )
+                for index, code in zip(to_create, codes)
+            ])
+        # bulk_create doesn't send post_save, update the filter and caches here
+        for shortened_url in shortened_urls:
+            short_code_filter.add(shortened_url.short_url)
+        resolver.remember_many(shortened_urls)
+        bump_generation(request.user.pk)
+        serializer = ShortUrlSerializer(shortened_urls, many=True)
+        for index, data in zip(to_create, serializer.data):
+            results[index] = data
+
+    # Repeats within the request share the short url created for the first one
+    for indexes in groups.values():
+        for index in indexes[1:]:
+            if results[index] is None:
+                results[index] = results[indexes[0]]
+
+    return Response({'results': results})
+
 # THE CODE BELOW SHOULD BE CHANGED
 @api_view(['DELETE', 'GET'])
 @permission_classes([IsAuthenticated])
@@ -91,7 +214,41 @@ def shortUrlDel(request, id):
     
     # Using id as string to pass short url params from the frontend
     # to get the original url from backend, so we can redirect on the frontend
+    # Codes ruled out by the existence filter are only looked up in the caches,
+    # everything else falls back to the database (see shorturl/resolver.py)
     if request.method == 'GET':
-        short_url = ShortUrl.objects.get(short_url=id)
-        serializer = ShortUrlSerializer(short_url, many=False)
-        return Response(serializer.data['original_url'])
\ No newline at end of file
+        resolution = resolver.resolve(id, might_exist=short_code_filter.might_exist(id))
+        if resolution is None or not resolver.check_limits(resolution):
+            return Response({'error': 'Short url not found'}, status=status.HTTP_404_NOT_FOUND)
+        click_buffer.record(resolution.id)
+        return Response(resolution.original_url)
+
+
+# Click stats for one of the user's short urls, hits are written in batches
+# so the last few seconds of clicks may not be included yet
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def shortUrlStats(request, id):
+    short_url = ShortUrl.objects.filter(pk=id, created_by=request.user).first()
+    if short_url is None:
+        return Response({'error': 'Short url not found'}, status=status.HTTP_404_NOT_FOUND)
+    clicks = short_url.clicks.order_by('bucket')
+    return Response({
+        'id': short_url.id,
+        'short_url': short_url.short_url,
+        'hits': short_url.hits,
+        'clicks': ShortUrlClicksSerializer(clicks, many=True).data,
+    })
+
+
+# Redirect endpoint, answers with a 302 to the original url so the frontend
+# doesn't need an extra round trip. It's a plain async Django view (no DRF, no auth)
+# so under ASGI it runs on the event loop without a thread hop.
+async def redirectShortUrl(request, code):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    resolution = await resolver.aresolve(code, might_exist=short_code_filter.might_exist(code))
+    if resolution is None or not await resolver.acheck_limits(resolution):
+        raise Http404('Short url not found')
+    click_buffer.record(resolution.id)
+    return HttpResponseRedirect(resolution.original_url)
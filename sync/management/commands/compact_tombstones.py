@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sync.models import Tombstone
+
+
+# Deletes tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS, --chunk-size rows
+# at a time through the deleted_at index, each chunk in its own short
+# transaction. Clients with an older cursor get a reset. Run it periodically (cron).
+class Command(BaseCommand):
+    help = 'Delete tombstones older than the sync retention in bounded chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to wait between chunks')
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        deleted = 0
+        while True:
+            ids = list(
+                Tombstone.objects.filter(deleted_at__lt=horizon)
+                .order_by('deleted_at')
+                .values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            Tombstone.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            time.sleep(options['sleep'])
+        self.stdout.write(f'Deleted {deleted} tombstones')
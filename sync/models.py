@@ -0,0 +1,23 @@
+from django.db import models
+from django.conf import settings
+
+
+# A deleted task or expense, so clients syncing with a cursor can drop their
+# copy. Kept for SYNC_TOMBSTONE_RETENTION_DAYS, see compact_tombstones.
+class Tombstone(models.Model):
+    TASK = 'task'
+    EXPENSE = 'expense'
+    MODEL_CHOICES = [(TASK, 'Task'), (EXPENSE, 'Expense')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='sync_tombstone_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
@@ -0,0 +1,12 @@
+from rest_framework.serializers import ModelSerializer
+from backend.serializers import ValuesSerializer
+from sync.models import Tombstone
+
+
+class TombstoneSerializer(ModelSerializer):
+  class Meta:
+    model = Tombstone
+    fields = ['id', 'model', 'object_id', 'deleted_at']
+
+
+tombstone_values = ValuesSerializer(TombstoneSerializer)
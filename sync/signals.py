@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from expense.models import Expense
+from sync.models import Tombstone
+from sync.tombstones import record_tombstone
+from task.models import Task
+
+
+# Deleting a user deletes their tasks and expenses too, nobody is left to sync
+# them (and the tombstones would point to a deleted user)
+def owner_deleted(origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is get_user_model()
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, using, origin=None, **kwargs):
+    if not owner_deleted(origin):
+        record_tombstone(Tombstone.TASK, instance.created_by_id, instance.pk, using)
+
+
+@receiver(post_delete, sender=Expense)
+def expense_deleted(sender, instance, using, origin=None, **kwargs):
+    if not owner_deleted(origin):
+        record_tombstone(Tombstone.EXPENSE, instance.created_by_id, instance.pk, using)
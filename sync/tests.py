@@ -0,0 +1,139 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from expense.models import Expense
+from sync.models import Tombstone
+from sync.tombstones import PendingTombstones
+from task.models import Task
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncChangesTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='sync@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=None):
+        response = self.client.get('/api/sync/', {'cursor': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def delete(self, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(url)
+
+    def test_full_sync_then_changes_since_cursor(self):
+        first = Task.objects.create(label='First', created_by=self.user)
+        second = Task.objects.create(label='Second', created_by=self.user)
+        expense = Expense.objects.create(label='Food', price='10', created_by=self.user)
+        other = get_user_model().objects.create_user(email='other@example.com', first_name='A', last_name='B')
+        Task.objects.create(label='Not mine', created_by=other)
+
+        data = self.sync()
+        self.assertEqual([task['label'] for task in data['tasks']], ['First', 'Second'])
+        self.assertEqual([row['id'] for row in data['expenses']], [expense.id])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+        self.assertFalse(data['reset'])
+        self.assertEqual(self.sync(data['cursor'])['tasks'], [])
+
+        first.label = 'Renamed'
+        first.save()
+        self.delete(f'/api/tasks/{second.id}')
+        self.delete(f'/api/expenses/{expense.id}')
+        changes = self.sync(data['cursor'])
+        self.assertEqual([task['label'] for task in changes['tasks']], ['Renamed'])
+        self.assertEqual(changes['expenses'], [])
+        self.assertEqual(
+            [(row['model'], row['object_id']) for row in changes['deleted']],
+            [(Tombstone.TASK, second.id), (Tombstone.EXPENSE, expense.id)],
+        )
+        self.assertEqual(self.sync(changes['cursor'])['deleted'], [])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_pages_cover_every_change_once(self):
+        now = timezone.now()
+        tasks = [Task(label=f'Task {i}', created_by=self.user, updated_at=now) for i in range(5)]
+        Task.objects.bulk_create(tasks)
+        seen = []
+        cursor = None
+        while True:
+            data = self.sync(cursor)
+            seen.extend(task['id'] for task in data['tasks'])
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, [task.id for task in tasks])
+
+    def test_recent_changes_wait_for_the_settle_time(self):
+        Task.objects.create(label='Task', created_by=self.user)
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync()
+        self.assertEqual(data['tasks'], [])
+        self.assertEqual(len(self.sync(data['cursor'])['tasks']), 1)
+
+    def test_batch_delete_writes_tombstones_together(self):
+        tasks = Task.objects.bulk_create([Task(label=f'Task {i}', created_by=self.user) for i in range(5)])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post('/api/tasks/batch/', {'operations': [{'op': 'delete', 'id': task.id} for task in tasks]}, format='json')
+        self.assertEqual(Tombstone.objects.filter(user=self.user).count(), 5)
+        flushes = [callback for callback in callbacks if isinstance(getattr(callback, '__self__', None), PendingTombstones)]
+        self.assertEqual(len(flushes), 1)
+
+    def test_rolled_back_delete_leaves_no_tombstone(self):
+        task = Task.objects.create(label='Task', created_by=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    task.delete()
+                    raise ValueError
+            except ValueError:
+                pass
+            other = Task.objects.create(label='Other', created_by=self.user)
+            other_id = other.id
+            other.delete()
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [other_id])
+
+    def test_deleting_the_user_writes_no_tombstones(self):
+        Task.objects.create(label='Task', created_by=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_old_cursor_resets_after_compaction(self):
+        task = Task.objects.create(label='Task', created_by=self.user)
+        cursor = self.sync()['cursor']
+        with override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=0):
+            data = self.sync(cursor)
+        self.assertTrue(data['reset'])
+        self.assertEqual([row['id'] for row in data['tasks']], [task.id])
+
+        Tombstone.objects.create(user=self.user, model=Tombstone.TASK, object_id=1, deleted_at=timezone.now() - timedelta(days=31))
+        Tombstone.objects.create(user=self.user, model=Tombstone.TASK, object_id=2, deleted_at=timezone.now())
+        call_command('compact_tombstones', '--sleep', '0', stdout=StringIO())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
+
+    def test_regular_syncs_without_deletions_never_reset(self):
+        Task.objects.create(label='Task', created_by=self.user)
+        cursor = self.sync()['cursor']
+        start = timezone.now()
+        for day in range(1, 45):
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=day)):
+                data = self.sync(cursor)
+            self.assertFalse(data['reset'], f'reset on day {day}')
+            cursor = data['cursor']
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/sync/', {'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sync/').status_code, 200)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/sync/').status_code, 401)
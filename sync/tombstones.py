@@ -0,0 +1,44 @@
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from sync.models import Tombstone
+
+
+_local = threading.local()
+
+
+class PendingTombstones:
+    def __init__(self, using, savepoint_ids):
+        self.using = using
+        self.savepoint_ids = savepoint_ids
+        self.tombstones = []
+
+    def flush(self):
+        Tombstone.objects.using(self.using).bulk_create(self.tombstones, batch_size=500)
+
+
+# Tombstones of a transaction are written together, one INSERT per 500 deletes
+# instead of one per delete, when it commits. They are buffered per savepoint:
+# Django drops the on_commit callback of a savepoint that is rolled back, and
+# its tombstones with it.
+def record_tombstone(model, user_id, object_id, using=DEFAULT_DB_ALIAS):
+    tombstone = Tombstone(user_id=user_id, model=model, object_id=object_id, deleted_at=timezone.now())
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        tombstone.save(using=using)
+        return
+
+    buffers = _local.__dict__.setdefault('buffers', {})
+    pending = buffers.get(using)
+    savepoint_ids = list(connection.savepoint_ids)
+    if (
+        pending is None
+        or pending.savepoint_ids != savepoint_ids
+        # Not registered anymore: committed, or rolled back
+        or not any(callback[1] == pending.flush for callback in connection.run_on_commit)
+    ):
+        pending = buffers[using] = PendingTombstones(using, savepoint_ids)
+        transaction.on_commit(pending.flush, using=using)
+    pending.tombstones.append(tombstone)
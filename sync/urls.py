@@ -0,0 +1,7 @@
+from django.urls import path
+
+from sync.views import changes
+
+urlpatterns=[
+    path('', changes, name='sync-changes'),
+]
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from expense.serializers import expense_values
+from sync.models import Tombstone
+from sync.serializers import tombstone_values
+from task.serializers import task_values
+
+
+# name: (rows of the user, values serializer, change time field)
+STREAMS = {
+    'tasks': (lambda user: user.task_set.all(), task_values, 'updated_at'),
+    'expenses': (lambda user: user.expense_set.all(), expense_values, 'updated_at'),
+    'deleted': (lambda user: Tombstone.objects.filter(user=user), tombstone_values, 'deleted_at'),
+}
+
+
+# The cursor holds the (change time, id) of the last row sent from each stream
+def encode_cursor(positions):
+    value = {name: position and [position[0].isoformat(), position[1]] for name, position in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        positions = {}
+        for name in STREAMS:
+            position = value[name]
+            if position is not None:
+                changed_at, pk = parse_datetime(position[0]), int(position[1])
+                if changed_at is None:
+                    raise ValueError
+                position = (changed_at, pk)
+            positions[name] = position
+    except (ValueError, TypeError, KeyError, IndexError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    if positions['deleted'] is None:
+        raise ValidationError({'cursor': 'Invalid cursor'})
+    return positions
+
+
+# Changes since the client's cursor: tasks and expenses updated after it and
+# tombstones of the ones deleted, read with keyset conditions on the
+# (owner, updated_at, id) indexes, so a sync costs what changed, not the table.
+#
+# Without a cursor every row is sent, with `reset` when the cursor was older
+# than the tombstones kept (compact_tombstones): the client has to drop its
+# copy and start over from the rows sent. Keep calling with the returned
+# cursor while `has_more`.
+#
+# Rows changed in the last SYNC_SETTLE_SECONDS are left for the next sync,
+# a transaction that has not committed yet can still add rows older than now.
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def changes(request):
+    now = timezone.now()
+    settled = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    horizon = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    cursor = request.query_params.get('cursor')
+    positions = decode_cursor(cursor) if cursor else None
+    reset = positions is not None and positions['deleted'][0] < horizon
+    if positions is None or reset:
+        # Full sync, deletions are followed from here on
+        positions = {'tasks': None, 'expenses': None, 'deleted': (settled, 0)}
+
+    page_size = settings.SYNC_PAGE_SIZE
+    data = {}
+    has_more = False
+    for name, (rows_of, values, field) in STREAMS.items():
+        queryset = rows_of(request.user).filter(**{f'{field}__lte': settled})
+        position = positions[name]
+        if position is not None:
+            changed_at, pk = position
+            queryset = queryset.filter(Q(**{f'{field}__gt': changed_at}) | Q(**{field: changed_at, 'id__gt': pk}))
+        rows = list(values.queryset(queryset).order_by(field, 'id')[:page_size + 1])
+        has_more_rows = len(rows) > page_size
+        if has_more_rows:
+            has_more = True
+            rows = rows[:page_size]
+        if rows:
+            positions[name] = (rows[-1][field], rows[-1]['id'])
+        if name == 'deleted' and not has_more_rows:
+            # Every tombstone up to `settled` was sent. The position moves on without
+            # deletions too, it's what is compared with the retention horizon.
+            positions[name] = (settled, 0)
+        data[name] = values.serialize(rows)
+
+    data.update(cursor=encode_cursor(positions), has_more=has_more, reset=reset)
+    return Response(data)
@@ -0,0 +1,74 @@
+import time
+
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from expense.models import Expense
+from expense.serializers import ExpenseSerializer, expense_values
+from task.models import Task
+from task.serializers import TaskSerializer, task_values
+
+
+class Rollback(Exception):
+    pass
+
+
+# Serializes --rows tasks and expenses to JSON with the ModelSerializers and with
+# the .values() fast path, best of --repeat runs each.
+# Everything runs in one transaction that is rolled back at the end.
+class Command(BaseCommand):
+    help = 'Benchmark list serialization with the ModelSerializers and the values fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        user = get_user_model().objects.create_user(
+            email='bench-serializers@example.com', first_name='Bench', last_name='Serializers'
+        )
+        Task.objects.bulk_create(
+            (Task(label=f'Task {i}', description='Description', created_by=user) for i in range(options['rows'])),
+            batch_size=5000,
+        )
+        Expense.objects.bulk_create(
+            (Expense(label=f'Expense {i}', price=Decimal(i) / 100, created_by=user) for i in range(options['rows'])),
+            batch_size=5000,
+        )
+
+        renderer = JSONRenderer()
+        for name, queryset, serializer_class, values in (
+            ('Tasks', user.task_set.all(), TaskSerializer, task_values),
+            ('Expenses', user.expense_set.all(), ExpenseSerializer, expense_values),
+        ):
+            serializer_time, serializer_json = self.best(
+                options['repeat'], lambda: renderer.render(serializer_class(queryset, many=True).data)
+            )
+            values_time, values_json = self.best(
+                options['repeat'], lambda: renderer.render(values.serialize(values.queryset(queryset)))
+            )
+            if serializer_json != values_json:
+                raise CommandError(f'{name}: the values path renders different JSON')
+            self.stdout.write(
+                f'{name}: serializer {serializer_time * 1000:.1f} ms, values {values_time * 1000:.1f} ms '
+                f'({serializer_time / values_time:.1f}x) for {options["rows"]} rows'
+            )
+
+    def best(self, repeat, render):
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = render()
+            times.append(time.perf_counter() - start)
+        return min(times), result
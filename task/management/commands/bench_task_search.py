@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from task.models import Task
+from task.search import index_tasks, search_task_ids
+
+
+WORDS = [
+    'report', 'groceries', 'meeting', 'invoice', 'email', 'call', 'review', 'plan', 'budget', 'travel',
+    'doctor', 'garden', 'car', 'school', 'project', 'deadline', 'birthday', 'gym', 'laundry', 'taxes',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+# Grows the task table to each of --sizes rows (spread over --users users) and
+# measures --searches searches of one user with --user-tasks tasks at each size.
+# Everything runs in one transaction that is rolled back at the end.
+class Command(BaseCommand):
+    help = 'Benchmark task search latency as the task table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--user-tasks', type=int, default=200)
+        parser.add_argument('--searches', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        random.seed(0)
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f'bench-search-{i}@example.com', first_name='Bench', last_name='Search')
+            for i in range(options['users'])
+        )
+        searched = users[0]
+        self.create_tasks([searched], options['user_tasks'], options['batch_size'])
+
+        queries = [' '.join(random.sample(WORDS, random.randint(1, 2))) for i in range(options['searches'])]
+        for size in sorted(int(size) for size in options['sizes'].split(',')):
+            self.create_tasks(users[1:], size - Task.objects.count(), options['batch_size'])
+
+            start = time.perf_counter()
+            for query in queries:
+                search_task_ids(searched.pk, query, 20)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{size} tasks: {elapsed / len(queries) * 1000:.3f} ms per search')
+
+    def create_tasks(self, users, count, batch_size):
+        while count > 0:
+            size = min(batch_size, count)
+            tasks = Task.objects.bulk_create(
+                Task(
+                    label=' '.join(random.sample(WORDS, 2)),
+                    description=' '.join(random.sample(WORDS, 5)),
+                    created_by=random.choice(users),
+                )
+                for i in range(size)
+            )
+            index_tasks(tasks)
+            count -= size
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from task.models import Task
+from task.search import index_tasks
+
+
+# Rewrites the SQLite full-text index from the tasks table, for tasks written
+# outside Django (dbshell, other tools), which are not indexed. Runs in one
+# transaction, searches keep seeing the old index until it commits.
+# On PostgreSQL the index is generated by the database and there is nothing to do.
+class Command(BaseCommand):
+    help = 'Rebuild the task full-text search index (SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Nothing to do on {connection.vendor}')
+            return
+
+        indexed = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM task_task_fts')
+            tasks = Task.objects.only('id', 'created_by_id', 'label', 'description').order_by('id')
+            batch = []
+            for task in tasks.iterator(chunk_size=options['chunk_size']):
+                batch.append(task)
+                if len(batch) == options['chunk_size']:
+                    index_tasks(batch)
+                    indexed += len(batch)
+                    batch = []
+            index_tasks(batch)
+            indexed += len(batch)
+        self.stdout.write(f'Indexed {indexed} tasks')
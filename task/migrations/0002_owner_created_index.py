@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"], name="task_owner_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,125 @@
+import re
+
+from django.db import migrations
+
+# Full-text index over task label and description, see task/search.py.
+# Every word is indexed prefixed with the owner's id, so searches stay fast
+# as other users add tasks.
+# SQLite: a contentless FTS5 table kept in sync by triggers, replaced by an
+# index written from Python in migration 0005.
+# PostgreSQL: a generated tsvector column with a GIN index.
+
+TERM_RE = re.compile(r"[^\W_]+")
+
+
+# Copy of task.search.owner_terms as it was when this migration was written,
+# the triggers call it as task_owner_terms()
+def owner_terms(owner_id, text):
+    return " ".join(
+        f"{owner_id}x{word}" for word in TERM_RE.findall((text or "").lower())
+    )
+
+
+def register_sqlite_functions(connection):
+    connection.connection.create_function(
+        "task_owner_terms", 2, owner_terms, deterministic=True
+    )
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE task_task_fts USING fts5(
+        label, description, content='', tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER task_task_fts_insert AFTER INSERT ON task_task BEGIN
+        INSERT INTO task_task_fts(rowid, label, description) VALUES (
+            new.id,
+            task_owner_terms(new.created_by_id, new.label),
+            task_owner_terms(new.created_by_id, new.description)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER task_task_fts_delete AFTER DELETE ON task_task BEGIN
+        INSERT INTO task_task_fts(task_task_fts, rowid, label, description) VALUES (
+            'delete',
+            old.id,
+            task_owner_terms(old.created_by_id, old.label),
+            task_owner_terms(old.created_by_id, old.description)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER task_task_fts_update AFTER UPDATE OF label, description, created_by_id ON task_task BEGIN
+        INSERT INTO task_task_fts(task_task_fts, rowid, label, description) VALUES (
+            'delete',
+            old.id,
+            task_owner_terms(old.created_by_id, old.label),
+            task_owner_terms(old.created_by_id, old.description)
+        );
+        INSERT INTO task_task_fts(rowid, label, description) VALUES (
+            new.id,
+            task_owner_terms(new.created_by_id, new.label),
+            task_owner_terms(new.created_by_id, new.description)
+        );
+    END
+    """,
+    """
+    INSERT INTO task_task_fts(rowid, label, description)
+    SELECT id, task_owner_terms(created_by_id, label), task_owner_terms(created_by_id, description)
+    FROM task_task
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS task_task_fts_update",
+    "DROP TRIGGER IF EXISTS task_task_fts_delete",
+    "DROP TRIGGER IF EXISTS task_task_fts_insert",
+    "DROP TABLE IF EXISTS task_task_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE task_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', regexp_replace(
+            coalesce(label, ''), '[[:alnum:]]+', created_by_id::text || 'x\\&', 'g'
+        )), 'A')
+        || setweight(to_tsvector('simple', regexp_replace(
+            coalesce(description, ''), '[[:alnum:]]+', created_by_id::text || 'x\\&', 'g'
+        )), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX task_search_vector_idx ON task_task USING GIN (search_vector)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS task_search_vector_idx",
+    "ALTER TABLE task_task DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            schema_editor.connection.ensure_connection()
+            register_sqlite_functions(schema_editor.connection)
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0002_owner_created_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRESQL_FORWARD}),
+            run({"sqlite": SQLITE_REVERSE, "postgresql": POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:13
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+# Sync reads rows by updated_at, rows saved before it was set get one
+def backfill_updated_at(apps, schema_editor):
+    Task = apps.get_model("task", "Task")
+    Task.objects.filter(updated_at__isnull=True).update(
+        updated_at=Coalesce("created_at", Now())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0003_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["created_by", "updated_at", "id"], name="task_owner_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,115 @@
+import re
+
+from django.db import migrations
+
+# SQLite: the FTS5 index is written from Python (task/search.py, index_tasks)
+# instead of by triggers calling a Python function, which every other SQLite
+# client lacked, so their writes to task_task failed. The table now keeps its
+# content, rows are deleted by rowid without the indexed text.
+# PostgreSQL: unchanged, the indexed column is generated in SQL.
+
+TERM_RE = re.compile(r"[^\W_]+")
+
+
+# Copy of task.search.owner_terms as it was when this migration was written
+def owner_terms(owner_id, text):
+    return " ".join(
+        f"{owner_id}x{word}" for word in TERM_RE.findall((text or "").lower())
+    )
+
+
+TRIGGERS = ["task_task_fts_update", "task_task_fts_delete", "task_task_fts_insert"]
+
+CONTENTLESS_TRIGGERS = [
+    """
+    CREATE TRIGGER task_task_fts_insert AFTER INSERT ON task_task BEGIN
+        INSERT INTO task_task_fts(rowid, label, description) VALUES (
+            new.id,
+            task_owner_terms(new.created_by_id, new.label),
+            task_owner_terms(new.created_by_id, new.description)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER task_task_fts_delete AFTER DELETE ON task_task BEGIN
+        INSERT INTO task_task_fts(task_task_fts, rowid, label, description) VALUES (
+            'delete',
+            old.id,
+            task_owner_terms(old.created_by_id, old.label),
+            task_owner_terms(old.created_by_id, old.description)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER task_task_fts_update AFTER UPDATE OF label, description, created_by_id ON task_task BEGIN
+        INSERT INTO task_task_fts(task_task_fts, rowid, label, description) VALUES (
+            'delete',
+            old.id,
+            task_owner_terms(old.created_by_id, old.label),
+            task_owner_terms(old.created_by_id, old.description)
+        );
+        INSERT INTO task_task_fts(rowid, label, description) VALUES (
+            new.id,
+            task_owner_terms(new.created_by_id, new.label),
+            task_owner_terms(new.created_by_id, new.description)
+        );
+    END
+    """,
+]
+
+
+def backfill(cursor):
+    cursor.execute("SELECT id, created_by_id, label, description FROM task_task")
+    while rows := cursor.fetchmany(2000):
+        cursor.connection.executemany(
+            "INSERT INTO task_task_fts(rowid, label, description) VALUES (?, ?, ?)",
+            [
+                (id, owner_terms(owner, label), owner_terms(owner, description))
+                for id, owner, label, description in rows
+            ],
+        )
+
+
+def forward(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for trigger in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    schema_editor.execute("DROP TABLE IF EXISTS task_task_fts")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE task_task_fts USING fts5("
+        "label, description, tokenize='unicode61')"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        backfill(cursor)
+
+
+# Back to the contentless table and triggers of migration 0003. Writes to
+# task_task then need task_owner_terms() registered on the connection again.
+def reverse(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.connection.ensure_connection()
+    schema_editor.connection.connection.create_function(
+        "task_owner_terms", 2, owner_terms, deterministic=True
+    )
+    schema_editor.execute("DROP TABLE IF EXISTS task_task_fts")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE task_task_fts USING fts5("
+        "label, description, content='', tokenize='unicode61')"
+    )
+    for statement in CONTENTLESS_TRIGGERS:
+        schema_editor.execute(statement)
+    with schema_editor.connection.cursor() as cursor:
+        backfill(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0004_owner_updated_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+# Sync reads rows by updated_at, a row without one never reaches a client.
+# 0004 filled the NULLs once, this fills any written since and forbids them.
+def backfill_updated_at(apps, schema_editor):
+    Task = apps.get_model("task", "Task")
+    Task.objects.filter(updated_at__isnull=True).update(
+        updated_at=Coalesce("created_at", Now())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task", "0006_created_at_not_null"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="task",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
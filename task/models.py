@@ -6,8 +6,14 @@ class Task(models.Model):
     label = models.CharField(max_length=200)
     description = models.CharField(max_length=255, null=True, blank=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
-    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'created_at', 'id'], name='task_owner_created_idx'),
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='task_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return self.label
@@ -0,0 +1,115 @@
+import re
+import threading
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+
+
+TERM_RE = re.compile(r'[^\W_]+')
+
+_local = threading.local()
+
+# Label matches weigh more than description matches
+SQLITE_SEARCH = '''
+    SELECT rowid FROM task_task_fts
+    WHERE task_task_fts MATCH %s
+    ORDER BY bm25(task_task_fts, 10.0, 1.0), rowid DESC
+    LIMIT %s OFFSET %s
+'''
+
+POSTGRESQL_SEARCH = '''
+    SELECT id FROM task_task, to_tsquery('simple', %s) query
+    WHERE created_by_id = %s AND search_vector @@ query
+    ORDER BY ts_rank(search_vector, query) DESC, id DESC
+    LIMIT %s OFFSET %s
+'''
+
+
+# Words are indexed prefixed with the owner's id ("12xgroceries"), so a search
+# only reads the owner's part of the index, however many tasks other users have
+def owner_terms(owner_id, text):
+    return ' '.join(f'{owner_id}x{word}' for word in TERM_RE.findall((text or '').lower()))
+
+
+# On SQLite the index is written from Python (task/signals.py on save and delete,
+# index_tasks after bulk_create/bulk_update), in the same transaction as the
+# tasks. Writes made outside Django are not indexed, rebuild_task_search_index
+# catches up. On PostgreSQL the indexed column is generated by the database.
+def index_tasks(tasks):
+    if connection.vendor != 'sqlite' or not tasks:
+        return
+    with connection.cursor() as cursor:
+        delete_from_index(cursor, [task.pk for task in tasks])
+        cursor.executemany(
+            'INSERT INTO task_task_fts(rowid, label, description) VALUES (%s, %s, %s)',
+            [(task.pk, owner_terms(task.created_by_id, task.label), owner_terms(task.created_by_id, task.description)) for task in tasks],
+        )
+
+
+def unindex_tasks(ids):
+    if connection.vendor != 'sqlite' or not ids:
+        return
+    with connection.cursor() as cursor:
+        delete_from_index(cursor, ids)
+
+
+class PendingRemovals:
+    def __init__(self, savepoint_ids):
+        self.savepoint_ids = savepoint_ids
+        self.ids = []
+
+    def flush(self):
+        unindex_tasks(self.ids)
+
+
+# Tasks deleted in a transaction leave the index together when it commits, one
+# DELETE per 500 tasks instead of one per task (queryset deletes send
+# post_delete for every task). Buffered per savepoint like sync/tombstones.py.
+# Until then the entries can still match, search only returns existing tasks.
+def unindex_task_later(id):
+    if connection.vendor != 'sqlite':
+        return
+    if not connection.in_atomic_block:
+        unindex_tasks([id])
+        return
+
+    pending = getattr(_local, 'pending', None)
+    savepoint_ids = list(connection.savepoint_ids)
+    if (
+        pending is None
+        or pending.savepoint_ids != savepoint_ids
+        # Not registered anymore: committed, or rolled back
+        or not any(callback[1] == pending.flush for callback in connection.run_on_commit)
+    ):
+        pending = _local.pending = PendingRemovals(savepoint_ids)
+        transaction.on_commit(pending.flush)
+    pending.ids.append(id)
+
+
+def delete_from_index(cursor, ids):
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f'DELETE FROM task_task_fts WHERE rowid IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+# Words of the search, anything else (quotes, operators) is dropped so user
+# input can't change the query syntax
+def search_terms(owner_id, query):
+    return owner_terms(owner_id, query).split()[:settings.TASK_SEARCH_MAX_TERMS]
+
+
+# Ids of the user's tasks matching every word (as a prefix) of the query, best
+# matches first. Uses the full-text index created by migrations 0003 and 0005.
+def search_task_ids(user_id, query, limit, offset=0):
+    terms = search_terms(user_id, query)
+    if not terms:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            match = ' AND '.join(f'"{term}"*' for term in terms)
+            cursor.execute(SQLITE_SEARCH, [match, limit, offset])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(POSTGRESQL_SEARCH, [' & '.join(f'{term}:*' for term in terms), user_id, limit, offset])
+        else:
+            raise NotSupportedError(f'Task search is not available on {connection.vendor}')
+        return [row[0] for row in cursor.fetchall()]
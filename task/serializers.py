@@ -1,8 +1,13 @@
 from rest_framework.serializers import ModelSerializer
+from backend.serializers import ValuesSerializer
 from task.models import Task
 
 
 class TaskSerializer(ModelSerializer):
   class Meta:
     model = Task
-    fields = "__all__"
\ No newline at end of file
+    fields = "__all__"
+
+
+# Same output for lists, without model instances
+task_values = ValuesSerializer(TaskSerializer)
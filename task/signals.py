@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.conditional import record_deletion
+from backend.responsecache import bump_generation
+from task.models import Task
+from task.search import index_tasks, unindex_task_later
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, **kwargs):
+    index_tasks([instance])
+    bump_generation(instance.created_by_id)
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    unindex_task_later(instance.pk)
+    record_deletion(Task, instance.created_by_id)
+    bump_generation(instance.created_by_id)
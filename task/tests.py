@@ -1,3 +1,360 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.responsecache import bump_generation
+from task.models import Task
+from task.search import index_tasks
+from task.serializers import TaskSerializer, task_values
+
+
+class TaskPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='tasks@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Task.objects.bulk_create(
+            Task(label=f'Task {i}', description='Description', created_by=self.user) for i in range(25)
+        )
+        # Ties on created_at are broken by id
+        Task.objects.filter(pk__in=Task.objects.order_by('id').values('pk')[:10]).update(created_at=timezone.now())
+
+    def test_pages_cover_every_task_once(self):
+        ids = []
+        url = '/api/tasks/?page_size=10'
+        page_queries = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            page_queries.append(len(queries))
+            self.assertNotIn('OFFSET', queries[-1]['sql'])
+            ids += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(ids), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(page_queries)), 1)
+
+    def test_unpaginated_list_is_unchanged(self):
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(len(response.data), 25)
+
+    def test_values_path_renders_the_serializer_json(self):
+        Task.objects.filter(pk__in=Task.objects.order_by('id').values('pk')[:3]).update(description=None)
+        tasks = Task.objects.order_by('id')
+        for zone in ['UTC', 'Europe/Skopje']:
+            with timezone.override(zone):
+                rows = task_values.serialize(task_values.queryset(tasks))
+                expected = TaskSerializer(tasks, many=True).data
+                # Field by field, in the same order
+                self.assertEqual([list(row.items()) for row in rows], [list(row.items()) for row in expected])
+                self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/tasks/?cursor=nonsense')
+        self.assertEqual(response.status_code, 400)
+
+    def test_every_task_has_the_timestamps_to_continue_from(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.filter(created_by=self.user).update(created_at=None)
+        # Sync continues from updated_at
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.filter(created_by=self.user).update(updated_at=None)
+
+    def test_sparse_fieldset_reads_and_sends_only_those_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/?fields=id,label')
+        self.assertEqual(response.data[0], {'id': response.data[0]['id'], 'label': response.data[0]['label']})
+        self.assertNotIn('description', queries[-1]['sql'])
+
+        ids = []
+        url = '/api/tasks/?page_size=10&fields=label'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual({key for task in response.data['results'] for key in task}, {'label'})
+            ids += [task['label'] for task in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(sorted(ids), sorted(f'Task {i}' for i in range(25)))
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.client.get('/api/tasks/?fields=id,password').status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/?fields=').status_code, 400)
+
+
+class TaskBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='batch@example.com', first_name='A', last_name='B')
+        self.other = get_user_model().objects.create_user(email='other@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, operations):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/tasks/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(queries)
+
+    def test_results_per_operation(self):
+        mine = Task.objects.create(label='Mine', description='Description', created_by=self.user)
+        gone = Task.objects.create(label='Gone', description='Description', created_by=self.user)
+        theirs = Task.objects.create(label='Theirs', description='Description', created_by=self.other)
+        results, queries = self.batch([
+            {'op': 'create', 'label': 'New', 'description': 'Description'},
+            {'op': 'create', 'label': 'Not valid!', 'description': 'Description'},
+            {'op': 'update', 'id': mine.id, 'label': 'Renamed', 'description': 'Changed'},
+            {'op': 'update', 'id': theirs.id, 'label': 'Renamed', 'description': 'Changed'},
+            {'op': 'delete', 'id': gone.id},
+            {'op': 'delete', 'id': theirs.id + 1000},
+            {'op': 'delete', 'id': mine.id},
+            {'op': 'archive'},
+        ])
+        self.assertEqual(results[0]['label'], 'New')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['label'], 'Renamed')
+        self.assertEqual(results[3], {'error': 'Not found'})
+        self.assertEqual(results[4], {'id': gone.id, 'deleted': True})
+        self.assertEqual(results[5], {'error': 'Not found'})
+        self.assertIn('error', results[6])
+        self.assertIn('error', results[7])
+
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual((mine.label, mine.description), ('Renamed', 'Changed'))
+        self.assertGreater(mine.updated_at, mine.created_at)
+        self.assertEqual(theirs.label, 'Theirs')
+        self.assertFalse(Task.objects.filter(pk=gone.id).exists())
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def operations(count):
+            tasks = Task.objects.bulk_create(
+                Task(label=f'Task {i}', description='Description', created_by=self.user) for i in range(count * 2)
+            )
+            return (
+                [{'op': 'create', 'label': f'New {i}', 'description': 'Description'} for i in range(count)]
+                + [{'op': 'update', 'id': task.id, 'label': 'Renamed', 'description': 'Changed'} for task in tasks[:count]]
+                + [{'op': 'delete', 'id': task.id} for task in tasks[count:]]
+            )
+
+        small_results, small_queries = self.batch(operations(2))
+        large_results, large_queries = self.batch(operations(100))
+        self.assertFalse(any('error' in result for result in small_results + large_results))
+        self.assertEqual(large_queries, small_queries)
+        self.assertEqual(Task.objects.filter(created_by=self.user, label='Renamed').count(), 102)
+
+    def test_invalid_body(self):
+        response = self.client.post('/api/tasks/batch/', {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='etag@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(label='Task', description='Description', created_by=self.user)
+
+    def test_if_none_match(self):
+        response = self.client.get('/api/tasks/')
+        etag = response['ETag']
+        # Served from the response cache
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Without a cached response only the aggregate runs
+        bump_generation(self.user.pk)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Pages have their own tag
+        self.assertNotEqual(self.client.get('/api/tasks/?page_size=1')['ETag'], etag)
+
+        self.client.put(f'/api/tasks/{self.task.id}', {'label': 'Renamed', 'description': 'Changed'}, format='json')
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.client.delete(f'/api/tasks/{self.task.id}')
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/tasks/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        old = 'Mon, 01 Jan 2001 00:00:00 GMT'
+        self.assertEqual(self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=old).status_code, 200)
+
+    def test_if_none_match_takes_precedence(self):
+        response = self.client.get('/api/tasks/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        # Within the same second, Last-Modified doesn't change
+        self.client.put(f'/api/tasks/{self.task.id}', {'label': 'Renamed', 'description': 'Changed'}, format='json')
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        old = 'Mon, 01 Jan 2001 00:00:00 GMT'
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE=old)
+        self.assertEqual(response.status_code, 304)
+
+
+class TaskResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='cache@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Task.objects.create(label='Task', description='Description', created_by=self.user)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get('/api/tasks/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/tasks/')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_writes_invalidate(self):
+        self.client.get('/api/tasks/')
+        self.client.post('/api/tasks/', {'label': 'New', 'description': 'Description'}, format='json')
+        self.assertEqual(len(self.client.get('/api/tasks/').json()), 2)
+
+        # bulk paths don't send signals
+        self.client.post('/api/tasks/batch/', {'operations': [
+            {'op': 'create', 'label': 'Batch', 'description': 'Description'},
+        ]}, format='json')
+        self.assertEqual(len(self.client.get('/api/tasks/').json()), 3)
+
+        # Changes made outside the views are picked up by the signals
+        Task.objects.filter(label='New').get().delete()
+        self.assertEqual(len(self.client.get('/api/tasks/').json()), 2)
+
+    def test_users_and_query_strings_are_cached_separately(self):
+        other = get_user_model().objects.create_user(email='other@example.com', first_name='A', last_name='B')
+        self.client.get('/api/tasks/')
+        self.assertEqual(len(self.client.get('/api/tasks/?page_size=1').json()['results']), 1)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/tasks/').json(), [])
+
+
+class TaskExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='export@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Task.objects.create(label='First', description='=cmd', created_by=self.user)
+        Task.objects.create(label='Second', description='Line, with "quotes"', created_by=self.user)
+
+    def test_csv(self):
+        response = self.client.get('/api/tasks/export/csv/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        # The header is sent before the query runs
+        content = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            header = next(content)
+        rows = list(csv.reader(io.StringIO((header + b''.join(content)).decode())))
+        self.assertEqual(rows[0], list(TaskSerializer().fields))
+        self.assertEqual([row[rows[0].index('description')] for row in rows[1:]], ["'=cmd", 'Line, with "quotes"'])
+
+    def test_ndjson_matches_list(self):
+        response = self.client.get('/api/tasks/export/ndjson/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.client.get('/api/tasks/').json())
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/tasks/export/xml/').status_code, 400)
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='search@example.com', first_name='A', last_name='B')
+        self.other = get_user_model().objects.create_user(email='other@example.com', first_name='A', last_name='B')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.label_match = Task.objects.create(label='Groceries', description='Milk and bread', created_by=self.user)
+        self.description_match = Task.objects.create(label='Shopping', description='Groceries for the week', created_by=self.user)
+        Task.objects.create(label='Groceries', description='Milk', created_by=self.other)
+
+    def search(self, query):
+        response = self.client.get('/api/tasks/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.json()['results']]
+
+    def test_ranked_and_scoped_to_the_user(self):
+        self.assertEqual(self.search('grocer'), [self.label_match.id, self.description_match.id])
+        self.assertEqual(self.search('milk grocer'), [self.label_match.id])
+        self.assertEqual(self.search('"milk" * ('), [self.label_match.id])
+        self.assertEqual(self.search('nothing'), [])
+
+    def test_index_follows_writes(self):
+        self.client.put(f'/api/tasks/{self.label_match.id}', {'label': 'Errands', 'description': 'Post office'}, format='json')
+        self.assertEqual(self.search('milk'), [])
+        self.assertEqual(self.search('post'), [self.label_match.id])
+        self.client.post('/api/tasks/batch/', {'operations': [
+            {'op': 'update', 'id': self.description_match.id, 'label': 'Post', 'description': 'Letters'},
+        ]}, format='json')
+        self.assertEqual(self.search('post'), [self.description_match.id, self.label_match.id])
+        self.description_match.delete()
+        self.assertEqual(self.search('post'), [self.label_match.id])
+
+    def test_deleted_tasks_leave_the_index_on_commit(self):
+        ids = [self.label_match.id, self.description_match.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/tasks/batch/', {'operations': [{'op': 'delete', 'id': id} for id in ids]}, format='json')
+        self.assertEqual(len([query for query in queries if 'task_task_fts' in query['sql']]), 0)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM task_task_fts WHERE rowid IN ({ids[0]}, {ids[1]})')
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_pagination(self):
+        index_tasks(Task.objects.bulk_create(Task(label=f'Report {i}', description='Weekly', created_by=self.user) for i in range(5)))
+        response = self.client.get('/api/tasks/search/', {'q': 'report', 'page_size': 2}).json()
+        ids = [task['id'] for task in response['results']]
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            ids += [task['id'] for task in response['results']]
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_writes_outside_django_work_and_are_reindexed(self):
+        # No trigger needs a function registered by Django
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO task_task (label, description, created_by_id, created_at, updated_at)"
+                " VALUES ('Garden', 'Roses', %s, %s, %s)",
+                [self.user.pk, timezone.now(), timezone.now()],
+            )
+        self.assertEqual(self.search('roses'), [])
+        call_command('rebuild_task_search_index', stdout=io.StringIO())
+        cache.clear()
+        self.assertEqual(self.search('roses'), [Task.objects.get(label='Garden').id])
+        self.assertEqual(self.search('grocer'), [self.label_match.id, self.description_match.id])
+
+    def test_results_are_the_users_tasks_only(self):
+        others = Task.objects.get(created_by=self.other)
+        # An index entry with the user's prefix for someone else's task
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM task_task_fts WHERE rowid = %s', [others.id])
+            cursor.execute(
+                'INSERT INTO task_task_fts(rowid, label, description) VALUES (%s, %s, %s)',
+                [others.id, f'{self.user.pk}xorphan', ''],
+            )
+        self.assertEqual(self.search('orphan'), [])
 
-# Create your tests here.
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/tasks/search/').status_code, 400)
@@ -1,8 +1,11 @@
 from django.urls import path
 
-from task.views import task, tasks
+from task.views import task, tasks, tasks_batch, tasks_export, tasks_search
 
 urlpatterns=[
     path('', tasks, name='tasks'),
+    path('batch/', tasks_batch, name='tasks-batch'),
+    path('export/<str:fmt>/', tasks_export, name='tasks-export'),
+    path('search/', tasks_search, name='tasks-search'),
     path('<int:id>', task),
 ]
\ No newline at end of file
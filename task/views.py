@@ -1,33 +1,71 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from backend.batch import CREATE, DELETE, NOT_FOUND, parse_operations
+from backend.conditional import conditional_list
+from backend.export import export_response
+from backend.pagination import KeysetPagination, PagePagination
+from backend.ratelimit import ratelimit
+from backend.responsecache import bump_generation, cached_response
+from backend.serializers import sparse_fields
 
-from task.serializers import TaskSerializer
+from task.serializers import TaskSerializer, task_values
 from task.models import Task
+from task.search import index_tasks, search_task_ids
 
 
+LABEL_MAX_LENGTH = Task._meta.get_field('label').max_length
+DESCRIPTION_MAX_LENGTH = Task._meta.get_field('description').max_length
+
+
+# Input rules for a task, returns an error message or None
+def validate_task(label, description):
+    # Sanitize and validate input
+    if not label or not description:
+        return 'Label and description are required'
+
+    # Ensure label contains only alphanumeric characters
+    if not isinstance(label, str) or not label.replace(" ", "").isalnum():
+        return 'Label should contain only alphanumeric characters'
+
+    if not isinstance(description, str):
+        return 'Description should be text'
+    if len(label) > LABEL_MAX_LENGTH:
+        return f'Label should be at most {LABEL_MAX_LENGTH} characters'
+    if len(description) > DESCRIPTION_MAX_LENGTH:
+        return f'Description should be at most {DESCRIPTION_MAX_LENGTH} characters'
+    return None
+
 # Tasks endpoints
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@ratelimit('60/m', key='user')
+@cached_response
+@conditional_list(lambda request: request.user.task_set.all())
 def tasks(request):
     if request.method == 'GET':
         user = request.user
         tasks = user.task_set.all()
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        values = sparse_fields(task_values, request)
+        # Paginated when the client asks for it with ?page_size= or ?cursor=,
+        # the pagination key is read even when it isn't one of the fields
+        rows = values.queryset(tasks, 'created_at', 'id')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(rows, request)
+        if page is not None:
+            return paginator.get_paginated_response(values.serialize(page))
+        return Response(values.serialize(rows))
     
     if request.method == 'POST':
         label = request.data.get('label')
         description = request.data.get('description')
 
-        # Sanitize and validate input
-        if not label or not description:
-            return Response({'error': 'Label and description are required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Ensure label contains only alphanumeric characters
-        if not label.replace(" ", "").isalnum():
-            return Response({'error': 'Label should contain only alphanumeric characters'}, status=status.HTTP_400_BAD_REQUEST)
+        error = validate_task(label, description)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
 
         task = Task.objects.create(
             label = label,
@@ -54,3 +92,102 @@ def task(request, id):
     if request.method == "DELETE":
         task.delete()
         return Response("Task deleted")
+
+
+# Full-text search over the user's tasks, ?q=words&page=&page_size=
+# Every word has to match the start of a word of the label or description,
+# results are ranked with label matches first
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_response
+def tasks_search(request):
+    query = request.query_params.get('q', '')
+    if not query.strip():
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = PagePagination()
+    ids = paginator.paginate(lambda limit, offset: search_task_ids(request.user.pk, query, limit, offset), request)
+    values = sparse_fields(task_values, request)
+    rows = {row['id']: row for row in values.queryset(request.user.task_set.filter(pk__in=ids), 'id')}
+    return paginator.get_paginated_response(values.serialize(rows[id] for id in ids if id in rows))
+
+
+# Downloads all the user's tasks as /export/csv/ or /export/ndjson/, streamed,
+# ?fields= picks the columns
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@ratelimit('10/m', key='user', methods=('GET',))
+def tasks_export(request, fmt):
+    tasks = request.user.task_set.order_by('created_at', 'id')
+    return export_response(sparse_fields(task_values, request), tasks, fmt, 'tasks')
+
+
+# Creates, updates and deletes many tasks in one transaction, see backend/batch.py
+# for the body. Results are per operation: the task, {"id": .., "deleted": true}
+# or {"error": ..}. Tasks of other users are not found. The number of queries
+# doesn't depend on the number of operations.
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@ratelimit('10/m', key='user')
+def tasks_batch(request):
+    operations, results, error = parse_operations(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    creates = []
+    updates = {}
+    deletes = {}
+    for index, operation in enumerate(operations):
+        if results[index] is not None:
+            continue
+        if operation['op'] == DELETE:
+            deletes[operation['id']] = index
+            continue
+        error = validate_task(operation.get('label'), operation.get('description'))
+        if error:
+            results[index] = {'error': error}
+        elif operation['op'] == CREATE:
+            creates.append(index)
+        else:
+            updates[operation['id']] = index
+
+    with transaction.atomic():
+        owned = {}
+        if updates or deletes:
+            owned = Task.objects.select_for_update().filter(created_by=request.user).in_bulk([*updates, *deletes])
+
+        # bulk_update doesn't run auto_now, updated_at is set here
+        now = timezone.now()
+        updated = []
+        for id, index in updates.items():
+            task = owned.get(id)
+            if task is None:
+                results[index] = NOT_FOUND
+                continue
+            task.label = operations[index]['label']
+            task.description = operations[index]['description']
+            task.updated_at = now
+            updated.append((index, task))
+        if updated:
+            Task.objects.bulk_update([task for index, task in updated], ['label', 'description', 'updated_at'])
+
+        created = Task.objects.bulk_create([
+            Task(label=operations[index]['label'], description=operations[index]['description'], created_by=request.user)
+            for index in creates
+        ])
+
+        deleted = [id for id in deletes if id in owned]
+        for id, index in deletes.items():
+            results[index] = {'id': id, 'deleted': True} if id in owned else NOT_FOUND
+        if deleted:
+            Task.objects.filter(created_by=request.user, pk__in=deleted).delete()
+
+        # bulk_create and bulk_update don't send post_save
+        index_tasks([task for index, task in updated] + created)
+        bump_generation(request.user.pk)
+
+    for index, task in zip(creates, created):
+        results[index] = TaskSerializer(task).data
+    for index, task in updated:
+        results[index] = TaskSerializer(task).data
+    return Response({'results': results})
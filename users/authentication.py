@@ -1,5 +1,12 @@
 from django.conf import settings
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.cache import get_cached_user
+from users.revocation import is_revoked
 
 
 class CustomJWTAuthentication(JWTAuthentication):
@@ -20,3 +27,25 @@ class CustomJWTAuthentication(JWTAuthentication):
             return self.get_user(validate_token), validate_token
         except:
             return None
+
+    # Tokens revoked at logout are rejected, without a query (users/revocation.py)
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken(_("Token is revoked"))
+        return token
+
+    # JWTAuthentication.get_user with the user cached (users/cache.py), so most
+    # requests don't query the users table. Inactive users are never cached.
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id, lambda: JWTAuthentication.get_user(self, validated_token))
+        # The password check depends on the token, not only on the user
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,122 @@
+import hashlib
+import io
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from users.models import UserAccount
+
+
+VARIANT_SIZES = (64, 128, 256)
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXTENSION = 'webp'
+VARIANT_QUALITY = 80
+# The formats users/uploads.py lets through
+INPUT_FORMATS = ['JPEG', 'PNG', 'GIF', 'WEBP']
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class AvatarBusy(Exception):
+    pass
+
+
+# Images are decoded and resized on a small pool shared by the process, so a
+# burst of uploads can't hold many decoded images in memory or use every CPU at
+# once. Pillow releases the GIL while it works. The pool only caps concurrency,
+# the request thread still waits for the result.
+executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatars')
+
+
+def variant_path(avatar_hash, size):
+    return f'images/avatars/{avatar_hash}/{size}.{VARIANT_EXTENSION}'
+
+
+def variant_urls(avatar_hash):
+    return {size: default_storage.url(variant_path(avatar_hash, size)) for size in VARIANT_SIZES}
+
+
+# Square crops of the image at every size. The image is re-encoded from its
+# pixels, EXIF (GPS, camera...), ICC profiles and comments are not copied.
+def make_variants(data):
+    try:
+        image = Image.open(io.BytesIO(data), formats=INPUT_FORMATS)
+        width, height = image.size
+        if width * height > settings.AVATAR_MAX_PIXELS:
+            raise InvalidImage('Image is too large')
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage('Upload a valid image') from e
+
+    # Phones store the rotation in EXIF, apply it before dropping the EXIF
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB')
+    variants = {}
+    for size in VARIANT_SIZES:
+        variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        variant.save(output, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+        variants[size] = output.getvalue()
+    return variants
+
+
+# Stores the variants of an uploaded image under the hash of its content and
+# returns the hash. An image that is already stored (the same file uploaded
+# before, by anyone) is not processed again.
+def store_avatar(data):
+    avatar_hash = hashlib.sha256(data).hexdigest()
+    if all(default_storage.exists(variant_path(avatar_hash, size)) for size in VARIANT_SIZES):
+        return avatar_hash
+
+    for size, content in make_variants(data).items():
+        path = variant_path(avatar_hash, size)
+        if default_storage.exists(path):
+            continue
+        name = default_storage.save(path, ContentFile(content))
+        # Stored under another name by a concurrent upload of the same file
+        if name != path:
+            default_storage.delete(name)
+    return avatar_hash
+
+
+# Runs store_avatar on the pool and waits for it, AvatarBusy when it takes
+# longer than AVATAR_PROCESS_TIMEOUT (usually because the pool is backed up)
+def process_avatar(uploaded_file):
+    data = uploaded_file.read()
+    future = executor.submit(store_avatar, data)
+    try:
+        return future.result(timeout=settings.AVATAR_PROCESS_TIMEOUT)
+    except futures.TimeoutError as e:
+        # Dropped if it hasn't started, otherwise it finishes in the background
+        future.cancel()
+        raise AvatarBusy('Too many avatars are being processed, try again later') from e
+
+
+# Deletes the variants once no user has the avatar anymore. Call it after the
+# user's avatar_hash has been changed. Best effort: a user setting the same
+# image at the same moment can lose the files, the next upload stores them again.
+def release_avatar(avatar_hash):
+    if not avatar_hash or UserAccount.objects.filter(avatar_hash=avatar_hash).exists():
+        return
+    for size in VARIANT_SIZES:
+        default_storage.delete(variant_path(avatar_hash, size))
+
+
+# Points the user to another avatar (None removes it) and deletes what the
+# user had before: variants nobody else uses, or a file uploaded before variants.
+def set_avatar(user, avatar_hash):
+    old_hash = user.avatar_hash
+    old_file = user.avatar.name if user.avatar else None
+    user.avatar_hash = avatar_hash
+    user.avatar = None
+    user.save(update_fields=['avatar', 'avatar_hash'])
+    if old_hash != avatar_hash:
+        release_avatar(old_hash)
+    if old_file:
+        default_storage.delete(old_file)
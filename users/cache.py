@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(user_id):
+    return f'usercache:version:{user_id}'
+
+
+def user_key(user_id, version):
+    return f'usercache:user:{user_id}:{version}'
+
+
+# Cached users are keyed by the user's version, so invalidating them is one
+# increment. A missing counter (new user, or evicted) starts from the current
+# time, above any version that could still have a cached user.
+def get_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(version_key(user_id), version, None):
+            version = cache.get(version_key(user_id), version)
+    return version
+
+
+def _bump(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), time.time_ns(), None)
+
+
+# Call after any write to the user row (users/signals.py does on save and delete,
+# QuerySet.update() has to call it itself). Bumped again once the transaction
+# commits, a request in between could have cached the old row.
+def bump_user_version(user_id):
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+# The user with id `user_id`, from the cache or from load() which is cached for
+# USER_CACHE_TIMEOUT seconds. The version is read before load() runs, a write in
+# between bumps it and what load() read is never served.
+def get_cached_user(user_id, load):
+    key = user_key(user_id, get_version(user_id))
+    user = cache.get(key)
+    if user is None:
+        user = load()
+        cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
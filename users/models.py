@@ -46,6 +46,8 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=255)
     email = models.EmailField(unique=True, max_length=255)
     avatar = models.ImageField(upload_to=get_upload_path, blank=True, null=True)
+    # Content hash of the avatar variants, see users/avatars.py
+    avatar_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from backend.bloom import CountingBloomFilter
+from backend.ratelimit import incr
+
+
+# Revoked tokens are kept in the shared cache until they expire, keyed by JTI,
+# and appended to a log (a counter and one entry per revocation) that every
+# process reads to keep its own Bloom filter of revoked JTIs. Almost every token
+# is not revoked, for those the check is a filter lookup in memory. Only filter
+# hits (revoked, or a false positive) are confirmed against the cache.
+#
+# Log entries all live as long as the longest token, so they expire in order.
+# A token revoked by another process is only in this process' filter after the
+# next sync, up to TOKEN_REVOCATION_SYNC_INTERVAL seconds later.
+#
+# revoke() takes a number before it writes the entry. An entry that isn't
+# there yet is read again at every sync for MISSING_ENTRY_GRACE seconds, after
+# that it's taken as evicted. A rebuild reads the last IN_FLIGHT_ENTRIES numbers
+# whatever the binary search finds, an entry being written looks expired to it.
+SEQUENCE_KEY = 'tokenrevocation:sequence'
+LOG_CHUNK_SIZE = 1000
+MISSING_ENTRY_GRACE = 5
+IN_FLIGHT_ENTRIES = 100
+
+
+def revoked_key(jti):
+    return f'tokenrevocation:jti:{jti}'
+
+
+def log_key(number):
+    return f'tokenrevocation:log:{number}'
+
+
+def log_timeout():
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    return math.ceil(lifetime.total_seconds()) + 1
+
+
+# {number: entry} of the numbers whose entry is in the cache
+def read_log(numbers):
+    numbers = list(numbers)
+    entries = {}
+    for start in range(0, len(numbers), LOG_CHUNK_SIZE):
+        keys = {log_key(number): number for number in numbers[start:start + LOG_CHUNK_SIZE]}
+        entries.update({keys[key]: entry for key, entry in cache.get_many(list(keys)).items()})
+    return entries
+
+
+# Entries expire in order, the first one still in the cache is found with a
+# binary search instead of reading every number since the counter started
+def first_live_entry(end):
+    low, high = 1, end + 1
+    while low < high:
+        middle = (low + high) // 2
+        if cache.get(log_key(middle)) is None:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class RevocationFilter:
+    def __init__(self):
+        self._bloom = None
+        self._sequence = 0
+        # Numbers handed out whose entry wasn't read yet: {number: first missed at}
+        self._missing = {}
+        self._synced_at = 0
+        self._syncing = False
+        self._lock = threading.Lock()
+
+    def build(self):
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        bloom = CountingBloomFilter(settings.TOKEN_REVOCATION_FILTER_CAPACITY, settings.TOKEN_REVOCATION_FILTER_ERROR_RATE)
+        start = max(1, min(first_live_entry(sequence), sequence - IN_FLIGHT_ENTRIES + 1))
+        entries = read_log(range(start, sequence + 1))
+        now = time.time()
+        for jti, expires_at in entries.values():
+            if expires_at > now:
+                bloom.add(jti)
+        missing = dict.fromkeys(set(range(start, sequence + 1)) - entries.keys(), time.monotonic())
+        return bloom, sequence, missing
+
+    def rebuild(self):
+        try:
+            bloom, sequence, missing = self.build()
+            with self._lock:
+                self._bloom = bloom
+                self._sequence = sequence
+                self._missing = missing
+                self._synced_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    # Adds the entries logged since the last sync and the ones that were still
+    # missing, one cache read when there are none
+    def sync(self):
+        try:
+            sequence = cache.get(SEQUENCE_KEY, 0)
+            if sequence < self._sequence:
+                # The counter was evicted and started over
+                self.rebuild()
+                return
+            numbers = [*self._missing, *range(self._sequence + 1, sequence + 1)]
+            entries = read_log(numbers) if numbers else {}
+            now = time.monotonic()
+            missing = {}
+            for number in numbers:
+                since = self._missing.get(number, now)
+                if number not in entries and now - since < MISSING_ENTRY_GRACE:
+                    missing[number] = since
+            with self._lock:
+                for jti, expires_at in entries.values():
+                    self._bloom.add(jti)
+                self._sequence = sequence
+                self._missing = missing
+                self._synced_at = now
+                # Revoked tokens are never removed, start over once the filter is full
+                if len(self._bloom) > self._bloom.capacity:
+                    self._bloom = None
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    def _start_sync(self):
+        with self._lock:
+            if self._syncing:
+                return None
+            if self._bloom is None:
+                self._syncing = True
+                threading.Thread(target=self.rebuild, daemon=True).start()
+                return None
+            if time.monotonic() - self._synced_at < settings.TOKEN_REVOCATION_SYNC_INTERVAL:
+                return None
+            self._syncing = True
+            return self.sync
+
+    def is_revoked(self, jti):
+        sync = self._start_sync()
+        if sync is not None:
+            sync()
+        bloom = self._bloom
+        # Until the filter is built every token is checked in the cache
+        if bloom is not None and jti not in bloom:
+            return False
+        return cache.get(revoked_key(jti)) is not None
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+
+revocation_filter = RevocationFilter()
+
+
+def is_revoked(token):
+    return revocation_filter.is_revoked(token[api_settings.JTI_CLAIM])
+
+
+# Revokes a validated token (simplejwt Token) until it expires
+def revoke(token):
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = token['exp']
+    timeout = math.ceil(expires_at - time.time())
+    if timeout <= 0:
+        return
+    cache.set(revoked_key(jti), True, timeout)
+    number = incr(SEQUENCE_KEY, None)
+    cache.set(log_key(number), (jti, expires_at), log_timeout())
+    revocation_filter.add(jti)
@@ -1,5 +1,22 @@
+from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework.serializers import ModelSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.tokens import UntypedToken
+from .avatars import VARIANT_SIZES, variant_urls
 from .models import UserAccount
+from .revocation import is_revoked
+
+
+# `avatar` is the largest variant, `variants` has the url of every size
+def avatar_representation(representation, instance, request):
+    if instance.avatar_hash:
+        urls = {str(size): request.build_absolute_uri(url) for size, url in variant_urls(instance.avatar_hash).items()}
+        representation['avatar'] = urls[str(max(VARIANT_SIZES))]
+        representation['variants'] = urls
+    elif instance.avatar:
+        representation['avatar'] = request.build_absolute_uri(instance.avatar.url)
+    return representation
 
 
 class AvatarSerializer(ModelSerializer):
@@ -9,7 +26,30 @@ class AvatarSerializer(ModelSerializer):
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
+        return avatar_representation(representation, instance, self.context['request'])
+
+
+# djoser's /users/ and /users/me/ with the same avatar urls. The avatar is only
+# changed through AvatarUploadView.
+class UserSerializer(DjoserUserSerializer):
+    class Meta(DjoserUserSerializer.Meta):
+        read_only_fields = (*DjoserUserSerializer.Meta.read_only_fields, 'avatar')
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        return avatar_representation(representation, instance, self.context['request'])
+
+
+# Tokens revoked at logout can't be refreshed or verified, TokenError becomes a 401
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs['refresh'])):
+            raise TokenError('Token is revoked')
+        return super().validate(attrs)
+
 
-        if instance.avatar:
-            representation['avatar'] = self.context['request'].build_absolute_uri(instance.avatar.url)
-        return representation
\ No newline at end of file
+class RevocableTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        if is_revoked(UntypedToken(attrs['token'])):
+            raise TokenError('Token is revoked')
+        return super().validate(attrs)
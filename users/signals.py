@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.cache import bump_user_version
+from users.models import UserAccount
+
+
+# Covers profile changes, deactivation and password changes (set_password + save)
+@receiver(post_save, sender=UserAccount)
+def user_saved(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+
+@receiver(post_delete, sender=UserAccount)
+def user_deleted(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
@@ -0,0 +1,94 @@
+import io
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+# (offset, bytes) that start the formats Pillow is trusted to decode
+IMAGE_SIGNATURES = [
+    [(0, b'\xff\xd8\xff')],  # JPEG
+    [(0, b'\x89PNG\r\n\x1a\n')],
+    [(0, b'GIF87a')],
+    [(0, b'GIF89a')],
+    [(0, b'RIFF'), (8, b'WEBP')],
+]
+SIGNATURE_LENGTH = 12
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def is_image(header):
+    return any(
+        all(header[offset:offset + len(part)] == part for offset, part in signature)
+        for signature in IMAGE_SIGNATURES
+    )
+
+
+# Checks the avatar while the request body is read, instead of after the whole
+# body was parsed and spooled to a temporary file: the upload is aborted as
+# soon as it's larger than AVATAR_MAX_SIZE or doesn't start like an image, and
+# a body whose Content-Length is already too large isn't read at all.
+# The file is kept in memory, it's never more than AVATAR_MAX_SIZE.
+#
+#   handler = AvatarUploadHandler(request._request)
+#   request._request.upload_handlers = [handler]
+#
+# then `handler.error` is set when the upload was rejected.
+class AvatarUploadHandler(FileUploadHandler):
+    field_name = 'avatar'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.max_size = settings.AVATAR_MAX_SIZE
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.error = 'File too large'
+            # Parsed as empty, the body is never read
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.file = io.BytesIO()
+        self.size = 0
+        self.checked = False
+
+    def reject(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def check_header(self):
+        self.checked = True
+        if not is_image(self.file.getbuffer()[:SIGNATURE_LENGTH].tobytes()):
+            self.reject('Upload a valid image')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.reject('File too large')
+        self.file.write(raw_data)
+        if not self.checked and self.size >= SIGNATURE_LENGTH:
+            self.check_header()
+        # Not passed on to other handlers
+        return None
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self.check_header()
+        self.file.seek(0)
+        return InMemoryUploadedFile(
+            file=self.file,
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
@@ -1,14 +1,21 @@
 import os
 from django.conf import settings
+from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
-from .serializers import AvatarSerializer
+from backend.ratelimit import ratelimit, TOKEN_BUCKET
+from .avatars import AvatarBusy, InvalidImage, process_avatar, set_avatar
+from .revocation import revoke
+from .serializers import AvatarSerializer, RevocableTokenRefreshSerializer, RevocableTokenVerifySerializer
+from .uploads import AvatarUploadHandler
 from djoser.social.views import ProviderAuthView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -47,6 +54,8 @@ class CustomProviderAuthView(ProviderAuthView):
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
+    # Slow down password guessing, allows short bursts of retries
+    @method_decorator(ratelimit('10/m', key='ip', algorithm=TOKEN_BUCKET))
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
 
@@ -77,6 +86,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
 
 class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = RevocableTokenRefreshSerializer
+
     def post(self, request, *args, **kwargs):
         refresh_token = request.COOKIES.get('refresh')
 
@@ -102,6 +113,8 @@ class CustomTokenRefreshView(TokenRefreshView):
 
 
 class CustomTokenVerifyView(TokenVerifyView):
+    serializer_class = RevocableTokenVerifySerializer
+
     def post(self, request, *args, **kwargs):
         access_token = request.COOKIES.get('access')
 
@@ -111,7 +124,21 @@ class CustomTokenVerifyView(TokenVerifyView):
         return super().post(request, *args, **kwargs)
 
 class LogoutView(APIView):
+    # An expired access token must not stop the refresh token from being revoked
+    permission_classes = [AllowAny]
+
     def post(self, request, *args, **kwargs):
+        # Copies of the tokens stop working too, not only the cookies
+        if request.auth is not None:
+            revoke(request.auth)
+        refresh_token = request.COOKIES.get('refresh') or request.data.get('refresh')
+        if refresh_token:
+            try:
+                revoke(RefreshToken(refresh_token))
+            except TokenError:
+                # Invalid or expired already
+                pass
+
         response = Response(status=status.HTTP_204_NO_CONTENT)
         
         response.delete_cookie(key='access', samesite='none')
@@ -126,27 +153,33 @@ class AvatarUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
-        if request.user.avatar:
-            request.user.avatar.delete()
-        
-        uploaded_file = request.data.get('avatar')
-        max_size = 5 * 1024 * 1024
+        # Checked while the body is read, before request.data is parsed
+        upload_handler = AvatarUploadHandler(request._request)
+        request._request.upload_handlers = [upload_handler]
 
-        if uploaded_file and uploaded_file.size > max_size:
-            return Response({'error': 'File too large'}, status=400)
+        uploaded_file = request.data.get('avatar')
+        if upload_handler.error:
+            return Response({'error': upload_handler.error}, status=400)
+        if not uploaded_file:
+            return Response({'error': 'No file was submitted'}, status=400)
 
-        serializer = AvatarSerializer(instance=request.user, data=request.data, context={'request': request})
-        
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=200)
-        else:
-            return Response(serializer.errors, status=500)
+        # Resized and stored by the avatar workers, see users/avatars.py
+        try:
+            avatar_hash = process_avatar(uploaded_file)
+        except InvalidImage as e:
+            return Response({'error': str(e)}, status=400)
+        except AvatarBusy as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+        # The old avatar is only removed once the new one is stored
+        set_avatar(request.user, avatar_hash)
+
+        serializer = AvatarSerializer(instance=request.user, context={'request': request})
+        return Response(serializer.data, status=200)
     
     def delete(self, request, *args, **kwargs):
         user = request.user
         try:
-            user.avatar.delete()
+            set_avatar(user, None)
             # Delete associated folder if empty
             pk_folder_path = os.path.abspath(os.path.join(os.getcwd(), 'media' , 'images', 'avatars', str(user.pk)))
             if os.path.exists(pk_folder_path) and not os.listdir(pk_folder_path):